@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it under uvicorn with ASYNC_API=True to use the async calendar views
+(see README, "ASGI Mode").
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
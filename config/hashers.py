@@ -0,0 +1,19 @@
+"""
+Password hashers whose cost comes from settings rather than Django's
+per-release defaults, so the CPU spent per login/signup is an explicit,
+benchmarked choice (see `manage.py benchmark_hashers`).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with PBKDF2_ITERATIONS rounds. It keeps the 'pbkdf2_sha256'
+    algorithm name, so existing hashes verify unchanged and are re-encoded to
+    the configured count on the user's next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
@@ -0,0 +1,199 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Each worker process keeps its own histograms. When METRICS_DIR is set, workers
+periodically write a snapshot to METRICS_DIR/metrics-<pid>.json and the
+/metrics endpoint sums every snapshot it finds, so a scrape that lands on any
+gunicorn worker reports totals for all of them. Histogram buckets, sums and
+counts are all plain counters, which makes summing across processes exact.
+
+When a worker exits (e.g. recycled by GUNICORN_MAX_REQUESTS), the gunicorn
+master folds its snapshot into metrics-retired.json and removes it (see
+gunicorn.conf.py), so totals keep what it counted and a new worker that
+reuses the pid starts a fresh file. Folding and scraping hold a lock on
+METRICS_DIR/metrics.lock, so a scrape never sees a worker twice or not at
+all and counters only go up.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name -> (help text, bucket upper bounds)
+HISTOGRAMS = {
+    'habify_request_duration_seconds': ("Wall time spent handling a request", LATENCY_BUCKETS),
+    'habify_db_queries': ("Database queries issued per request", QUERY_BUCKETS),
+    'habify_db_duration_seconds': ("Time spent in database queries per request", LATENCY_BUCKETS),
+    'habify_response_size_bytes': ("Response body size", SIZE_BUCKETS),
+}
+
+COUNTERS = {
+    'habify_requests_total': "Requests handled, by view and status class",
+    'habify_dashboard_cache_total': "Dashboard cache lookups and writes, by result",
+    'habify_throttle_total': "Throttled-endpoint requests, by throttle scope and result",
+}
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (name, view) -> [bucket counts..., sum, count]
+        self.counters = {}    # (name, labels) -> value
+        self.flushed_at = 0.0
+
+    def observe(self, name, view, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            series = self.histograms.get((name, view))
+            if series is None:
+                series = self.histograms[(name, view)] = [0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def increment(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def record_request(self, view, status, duration, queries, db_duration, size):
+        self.observe('habify_request_duration_seconds', view, duration)
+        if queries is not None:
+            self.observe('habify_db_queries', view, queries)
+            self.observe('habify_db_duration_seconds', view, db_duration)
+        if size is not None:
+            self.observe('habify_response_size_bytes', view, size)
+        self.increment('habify_requests_total', {'view': view, 'status': f'{status // 100}xx'})
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': [[name, view, list(series)] for (name, view), series in self.histograms.items()],
+                'counters': [[name, list(map(list, labels)), value] for (name, labels), value in self.counters.items()],
+            }
+
+    def maybe_flush(self, force=False):
+        """Write this worker's snapshot to METRICS_DIR, at most every METRICS_FLUSH_SECONDS"""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (not force and now - self.flushed_at < settings.METRICS_FLUSH_SECONDS):
+            return
+        self.flushed_at = now
+        _write(os.path.join(directory, f'metrics-{os.getpid()}.json'), self.snapshot())
+
+
+registry = Registry()
+
+
+def _write(path, snapshot):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temp_path, path)
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None  # missing, or written by a worker killed mid-write
+
+
+@contextmanager
+def _locked(directory, exclusive=False):
+    with open(os.path.join(directory, 'metrics.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def retire(directory, pid):
+    """Fold the exited worker `pid`'s snapshot into metrics-retired.json"""
+    path = os.path.join(directory, f'metrics-{pid}.json')
+    retired_path = os.path.join(directory, 'metrics-retired.json')
+    with _locked(directory, exclusive=True):
+        snapshot = _read(path)
+        if snapshot is None:
+            return
+        histograms, counters = merge([s for s in (_read(retired_path), snapshot) if s is not None])
+        _write(retired_path, {
+            'histograms': [[name, view, series] for (name, view), series in histograms.items()],
+            'counters': [[name, list(map(list, labels)), value] for (name, labels), value in counters.items()],
+        })
+        os.remove(path)
+
+
+def reset(directory):
+    """Remove every snapshot, e.g. ones left behind by a previous master"""
+    with _locked(directory, exclusive=True):
+        for filename in os.listdir(directory):
+            if filename.startswith('metrics-') and filename.endswith('.json'):
+                os.remove(os.path.join(directory, filename))
+
+
+def collect():
+    """Every worker's snapshot (or just this process's) merged into one"""
+    if not settings.METRICS_DIR:
+        return merge([registry.snapshot()])
+    registry.maybe_flush(force=True)
+    with _locked(settings.METRICS_DIR):
+        snapshots = [
+            _read(os.path.join(settings.METRICS_DIR, filename))
+            for filename in os.listdir(settings.METRICS_DIR)
+            if filename.startswith('metrics-') and filename.endswith('.json')
+        ]
+    return merge([snapshot for snapshot in snapshots if snapshot is not None])
+
+
+def merge(snapshots):
+    """Sum snapshots into (histograms, counters) dicts keyed like a Registry's"""
+    histograms, counters = {}, {}
+    for snapshot in snapshots:
+        for name, view, series in snapshot['histograms']:
+            merged = histograms.setdefault((name, view), [0] * len(series))
+            for index, value in enumerate(series):
+                merged[index] += value
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _labels(pairs):
+    return ','.join(f'{key}="{value}"' for key, value in pairs)
+
+
+def render():
+    histograms, counters = collect()
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (series_name, view), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels([("view", view), ("le", bound)])}}} {cumulative}')
+            lines.append(f'{name}_bucket{{{_labels([("view", view), ("le", "+Inf")])}}} {series[-1]}')
+            lines.append(f'{name}_sum{{{_labels([("view", view)])}}} {series[-2]}')
+            lines.append(f'{name}_count{{{_labels([("view", view)])}}} {series[-1]}')
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f'{name}{{{_labels(labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
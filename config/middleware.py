@@ -0,0 +1,104 @@
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+from .metrics import registry
+
+
+class QueryTimer:
+    """connection.execute_wrapper() hook counting queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, DB query count, DB time and response size for every
+    request, grouped by resolved URL name, and reports them in the /metrics
+    histograms and, with SERVER_TIMING, a Server-Timing header.
+
+    Under ASGI the ORM runs queries on a separate thread whose connection
+    cannot be wrapped from here, so async requests report wall time and
+    size only.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, timer)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, None)
+
+    def record(self, request, response, duration, timer):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record_request(
+            view, response.status_code, duration,
+            timer.count if timer else None, timer.duration if timer else None, size
+        )
+        registry.maybe_flush()
+
+        if settings.SERVER_TIMING:
+            server_timing = f'app;dur={duration * 1000:.1f}'
+            if timer:
+                server_timing += f', db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries"'
+            response['Server-Timing'] = server_timing
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also sit in an async middleware chain. Stock
+    WhiteNoiseMiddleware is sync-only, which under ASGI would push every
+    request (static or not) through a thread and back.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 import os
 from pathlib import Path
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     # My apps
     'user_app',
     'rewards_app',
+    'tasks_app',
 
     # Third-party
     'rest_framework',
@@ -44,9 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middleware.RequestMetricsMiddleware',  # first, so it times everything below
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in prod
+    'config.middleware.StaticFilesMiddleware',  # WhiteNoise, for static files in prod (sync or async)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,6 +99,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -126,6 +130,7 @@ if not DEBUG:
 CSRF_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_HTTPONLY = False
 CSRF_USE_SESSIONS = False
+CSRF_FAILURE_VIEW = 'config.views.csrf_failure'
 
 ROOT_URLCONF = 'config.urls'
 
@@ -146,6 +151,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Serve the read-heavy calendar endpoints from user_app.async_views. Only
+# worth enabling under ASGI (uvicorn workers); under WSGI every async view
+# pays for an event loop hop.
+ASYNC_API = os.environ.get('ASYNC_API', 'False') == 'True'
 
 # Database (SQLite for dev, PostgreSQL for prod)
 # DATABASES = {
@@ -154,21 +165,53 @@ WSGI_APPLICATION = 'config.wsgi.application'
 #         conn_max_age=600
 #     )
 # }
-if DEBUG:  # Local development → use SQLite
+# Connection management. Persistent connections (DB_CONN_MAX_AGE seconds,
+# 0 = close after every request) avoid a TCP+TLS handshake per request;
+# health checks test a reused connection before the request that picks it up,
+# so one the server dropped while idle is replaced instead of raising.
+# DB_POOL chooses how connections are shared:
+#   none      - each worker thread keeps its own persistent connection
+#   pgbouncer - connect through a PgBouncer in transaction mode: keep
+#               connections short-lived on our side and disable server-side
+#               cursors, which do not survive across pooled transactions
+#   psycopg   - Django's built-in psycopg pool (needs Django 5.1+ and
+#               psycopg[pool]); sized by DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE
+# Setting DATABASE_URL in development points it at a local Postgres.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+DB_POOL = os.environ.get('DB_POOL', 'none')
+if DEBUG:  # Local development → SQLite unless DATABASE_URL says otherwise
     DATABASES = {
-        'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
-        }
+        'default': dj_database_url.config(
+            default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
     }
 else:  # Production (Render) → use Postgres
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
-            ssl_require=True
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+            ssl_require=os.environ.get('DB_SSL_REQUIRE', 'True') == 'True'
         )
     }
+if DB_POOL == 'pgbouncer':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_POOL == 'psycopg':
+    import django
+    if django.VERSION < (5, 1):
+        raise ImproperlyConfigured("DB_POOL=psycopg needs Django 5.1 or newer; use DB_POOL=pgbouncer instead")
+    # The pool owns connection lifetime; Django refuses persistent connections with it
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+    }
+elif DB_POOL != 'none':
+    raise ImproperlyConfigured(f"DB_POOL must be none, pgbouncer or psycopg, not {DB_POOL!r}")
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -178,6 +221,22 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing. PASSWORD_HASHER picks the hasher new and upgraded hashes
+# use; the rest stay listed so existing hashes keep verifying and are
+# re-hashed with the preferred one on the next login. Compare the options
+# on the target hardware with `python manage.py benchmark_hashers`.
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', '600000'))
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'config.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',  # needs argon2-cffi
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',  # needs bcrypt
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -193,13 +252,109 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# How often ReactAppView re-stat()s the cached index.html for a new build
+SPA_SHELL_RECHECK_SECONDS = float(os.environ.get('SPA_SHELL_RECHECK_SECONDS', '0' if DEBUG else '60'))
+
+# How often each worker re-reads the reward catalog into memory. Edits made
+# in this process (e.g. the admin) apply immediately.
+CATALOG_RECHECK_SECONDS = float(os.environ.get('CATALOG_RECHECK_SECONDS', '60'))
+
 # WhiteNoise for serving static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caches. The dashboard cache defaults to per-process local memory; point
+# DASHBOARD_CACHE_BACKEND/DASHBOARD_CACHE_LOCATION at e.g.
+# django.core.cache.backends.redis.RedisCache to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'habify-default',
+    },
+    'dashboard': {
+        'BACKEND': os.environ.get('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DASHBOARD_CACHE_LOCATION', 'habify-dashboard'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('DASHBOARD_CACHE_MAX_ENTRIES', '10000'))},
+    },
+    'idempotency': {
+        'BACKEND': os.environ.get('IDEMPOTENCY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('IDEMPOTENCY_CACHE_LOCATION', 'habify-idempotency'),
+    },
+    'throttle': {
+        'BACKEND': os.environ.get('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'habify-throttle'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('THROTTLE_CACHE_MAX_ENTRIES', '100000'))},
+    },
+    'sessions': {
+        'BACKEND': os.environ.get('SESSION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', 'habify-sessions'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', '10000'))},
+    },
+}
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+# Invalidating a local-memory cache only reaches the process that did it, not
+# the other gunicorn workers (nor, from the task worker or a cron job, any of
+# them). Unless the dashboard cache is shared, entries therefore default to a
+# few seconds, which bounds how stale another worker's copy can be.
+DASHBOARD_CACHE_SHARED = CACHES['dashboard']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', '3600' if DASHBOARD_CACHE_SHARED else '5'))
+
+# Coin ledger (user_app/ledger.py). Balances are cached in the dashboard
+# cache, as briefly as the stats when it is not shared. Snapshots only fold
+# transactions older than the lag, so ones still committing are never
+# skipped. The worker takes them daily at COIN_SNAPSHOT_AT (HH:MM,
+# TIME_ZONE); a balance read (including the one under the check-in lock)
+# then sums at most about a day of transactions. Set it empty only when
+# snapshot_coins runs from cron instead.
+COIN_CACHE_TIMEOUT = int(os.environ.get('COIN_CACHE_TIMEOUT', '300' if DASHBOARD_CACHE_SHARED else '5'))
+COIN_SNAPSHOT_LAG_SECONDS = int(os.environ.get('COIN_SNAPSHOT_LAG_SECONDS', '300'))
+COIN_SNAPSHOT_AT = os.environ.get('COIN_SNAPSHOT_AT', '03:00')
+
+# Request metrics. Set METRICS_DIR to a directory shared by all gunicorn
+# workers (e.g. /tmp/habify-metrics) so /metrics reports every worker.
+# SERVER_TIMING adds the per-request app/DB timings to responses as a
+# Server-Timing header; it is off unless DEBUG since it is visible to anyone.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SERVER_TIMING = os.environ.get('SERVER_TIMING', str(DEBUG)) == 'True'
+if METRICS_DIR:
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+# Calendar pagination (?page_size= can override up to the max)
+CALENDAR_PAGE_SIZE = int(os.environ.get('CALENDAR_PAGE_SIZE', '100'))
+CALENDAR_MAX_PAGE_SIZE = int(os.environ.get('CALENDAR_MAX_PAGE_SIZE', '1000'))
+
+# Rows fetched per round trip (and lines per chunk written) by /api/export/
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))
+
+# Largest number of entries accepted by /api/daylog/batch/
+DAYLOG_BATCH_MAX = int(os.environ.get('DAYLOG_BATCH_MAX', '366'))
+
+# How long a stored Idempotency-Key response is replayed for
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_CACHE_ALIAS = 'idempotency'
+
+# Token-bucket throttles on login and password reset (user_app/throttling.py).
+# A rate of N/period lets a burst of N through, then refills N per period.
+# Set NUM_PROXIES to the number of proxies in front of the app (1 on Render)
+# so the client IP is taken from X-Forwarded-For; unset, REMOTE_ADDR is used.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', 'True') == 'True'
+THROTTLE_CACHE_ALIAS = 'throttle'
+REST_FRAMEWORK = {
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP', '20/min'),
+        'login_username': os.environ.get('THROTTLE_LOGIN_USERNAME', '5/min'),
+        'password_reset_ip': os.environ.get('THROTTLE_PASSWORD_RESET_IP', '5/min'),
+        'password_reset_email': os.environ.get('THROTTLE_PASSWORD_RESET_EMAIL', '3/hour'),
+        'password_reset_account': os.environ.get('THROTTLE_PASSWORD_RESET_ACCOUNT', '5/hour'),
+    },
+}
+
 # Email settings for password reset (configure for production)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')  # console for development
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
@@ -207,6 +362,18 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@habify.com')
 
+# Background tasks (tasks_app, run by `python manage.py worker`)
+TASK_BATCH_SIZE = int(os.environ.get('TASK_BATCH_SIZE', '100'))
+TASK_POLL_SECONDS = float(os.environ.get('TASK_POLL_SECONDS', '1'))
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', '5'))
+TASK_RETRY_BASE_SECONDS = float(os.environ.get('TASK_RETRY_BASE_SECONDS', '30'))
+TASK_RETRY_MAX_SECONDS = float(os.environ.get('TASK_RETRY_MAX_SECONDS', '3600'))
+TASK_LOCK_TIMEOUT_SECONDS = int(os.environ.get('TASK_LOCK_TIMEOUT_SECONDS', '600'))
+
+# Time of day (HH:MM, TIME_ZONE) at which the worker resets lapsed streaks.
+# Leave empty to run `python manage.py expire_streaks` from cron instead.
+STREAK_EXPIRY_AT = os.environ.get('STREAK_EXPIRY_AT', '')
+
 # Admin URL customization for security
 ADMIN_URL = os.environ.get('ADMIN_URL', 'admin/')
 
@@ -217,5 +384,21 @@ SESSION_COOKIE_SECURE = not DEBUG  # HTTPS only in production
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# Session storage. 'db' costs a SELECT on every authenticated request;
+# 'cached_db' serves reads from the 'sessions' cache and writes through to the
+# database; 'signed_cookies' keeps the session in the cookie itself (no server
+# state, but a logged-out cookie stays valid until it expires). With more than
+# one worker, cached_db needs a shared SESSION_CACHE_BACKEND (e.g. Redis):
+# a per-process cache would keep serving a session another worker ended.
+# Compare them with `python manage.py benchmark --session-engine ...`.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+
 
 
@@ -0,0 +1,179 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+from user_app.benchmark import logged_in_clients, seed_users
+from .metrics import Registry, reset, retire
+from .views import ShellCache
+
+
+def scrape(client):
+    response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+    return {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in response.content.decode().splitlines() if not line.startswith('#')
+    }
+
+
+@override_settings(METRICS_TOKEN='secret', METRICS_DIR='')
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        # A fresh registry per test, shared by the middleware and /metrics
+        self.registry = Registry()
+        for target in ('config.metrics.registry', 'config.middleware.registry'):
+            patcher = mock.patch(target, self.registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_requests_are_counted_and_timed(self):
+        client, user = logged_in_clients(seed_users(1, 0, prefix='metrics'))[0]
+        client.get('/api/csrf/')
+        with self.settings(SERVER_TIMING=True):
+            response = client.get('/api/coins/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        with self.settings(SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/api/coins/'))
+
+        metrics = scrape(self.client)
+        self.assertEqual(metrics['habify_requests_total{status="2xx",view="csrf"}'], 1)
+        self.assertEqual(metrics['habify_requests_total{status="2xx",view="coin_balance"}'], 1)
+        self.assertEqual(metrics['habify_requests_total{status="4xx",view="coin_balance"}'], 1)
+        self.assertEqual(metrics['habify_db_queries_count{view="coin_balance"}'], 2)
+        self.assertGreater(metrics['habify_db_queries_sum{view="coin_balance"}'], 0)
+        self.assertEqual(metrics['habify_db_queries_bucket{view="csrf",le="1"}'], 1)  # no queries
+
+        # Buckets are cumulative and end at the count
+        buckets = [
+            value for key, value in metrics.items()
+            if key.startswith('habify_request_duration_seconds_bucket{view="coin_balance"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], metrics['habify_request_duration_seconds_count{view="coin_balance"}'])
+        self.assertEqual(
+            metrics['habify_response_size_bytes_count{view="coin_balance"}'],
+            metrics['habify_request_duration_seconds_count{view="coin_balance"}'],
+        )
+
+    def test_scrape_needs_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_worker_snapshots_are_summed(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        directory = temp_dir.name
+        other = Registry()
+        other.record_request('csrf', 200, 0.02, 0, 0.0, 64)
+        other.increment('habify_throttle_total', {'scope': 'login_ip', 'result': 'throttled'}, 3)
+        with open(os.path.join(directory, 'metrics-1.json'), 'w') as file:
+            json.dump(other.snapshot(), file)
+        with open(os.path.join(directory, 'metrics-2.json'), 'w') as file:
+            file.write('{"histograms": [')  # a worker caught mid-write is skipped
+
+        with self.settings(METRICS_DIR=directory):
+            self.client.get('/api/csrf/')
+            metrics = scrape(self.client)
+        self.assertIn(f'metrics-{os.getpid()}.json', os.listdir(directory))
+        self.assertEqual(metrics['habify_requests_total{status="2xx",view="csrf"}'], 2)
+        self.assertEqual(metrics['habify_request_duration_seconds_count{view="csrf"}'], 2)
+        self.assertEqual(metrics['habify_response_size_bytes_bucket{view="csrf",le="256"}'], 2)
+        self.assertEqual(metrics['habify_throttle_total{result="throttled",scope="login_ip"}'], 3)
+
+    def test_exited_worker_is_folded_into_the_retired_totals(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        directory = temp_dir.name
+        for pid in (1, 1):  # the second worker reuses the first one's pid
+            other = Registry()
+            other.increment('habify_throttle_total', {'scope': 'login_ip', 'result': 'allowed'}, 2)
+            with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as file:
+                json.dump(other.snapshot(), file)
+            retire(directory, pid)
+        retire(directory, 2)  # exited before its first flush
+
+        with self.settings(METRICS_DIR=directory):
+            metrics = scrape(self.client)
+        self.assertNotIn('metrics-1.json', os.listdir(directory))
+        self.assertEqual(metrics['habify_throttle_total{result="allowed",scope="login_ip"}'], 4)
+
+        reset(directory)
+        self.assertEqual([name for name in os.listdir(directory) if name.endswith('.json')], [])
+
+
+@override_settings(SPA_SHELL_RECHECK_SECONDS=0)
+class ShellCacheTests(TestCase):
+    MTIME = 1700000000
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, 'index.html')
+        self.write(b'<html>app v1</html>')
+        patcher = mock.patch('config.views.shell_cache', ShellCache(self.path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, body, mtime=MTIME):
+        with open(self.path, 'wb') as file:
+            file.write(body)
+        os.utime(self.path, (mtime, mtime))
+
+    def get(self, **headers):
+        return self.client.get('/dashboard', **headers)
+
+    def test_full_response_carries_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'<html>app v1</html>')
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertEqual(response['Last-Modified'], http_date(self.MTIME))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_gzip_variant_has_its_own_etag(self):
+        plain_etag = self.get()['ETag']
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'<html>app v1</html>')
+        self.assertEqual(response['ETag'], plain_etag[:-1] + '-gzip"')
+        # A tag for the other representation does not validate this one
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain_etag).status_code, 200)
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        for header in (etag, f'"stale", {etag}', '*'):
+            response = self.get(HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_if_modified_since(self):
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=http_date(self.MTIME)).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=http_date(self.MTIME + 60)).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=http_date(self.MTIME - 60)).status_code, 200)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE='not a date').status_code, 200)
+        # If-None-Match wins when both are sent
+        response = self.get(HTTP_IF_NONE_MATCH='"stale"', HTTP_IF_MODIFIED_SINCE=http_date(self.MTIME))
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_build_changes_the_validators(self):
+        etag = self.get()['ETag']
+        self.write(b'<html>app v2</html>', mtime=self.MTIME + 3600)
+        response = self.get(HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=http_date(self.MTIME))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'<html>app v2</html>')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response['Last-Modified'], http_date(self.MTIME + 3600))
+
+    def test_missing_build_falls_back(self):
+        os.remove(self.path)
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'React Build Not Found', response.content)
+        self.assertNotIn('ETag', response)
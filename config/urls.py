@@ -17,7 +17,7 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import ReactAppView
+from .views import ReactAppView, metrics_view
 
 urlpatterns = [
     # Django admin
@@ -26,6 +26,9 @@ urlpatterns = [
     # API endpoints
     path('api/', include('user_app.urls')),
     path('api/rewards/', include('rewards_app.urls')),
+
+    # Prometheus scrape target
+    path('metrics', metrics_view, name='metrics'),
     
     # Serve React app for all other routes (must be last)
     re_path(r'^.*$', ReactAppView.as_view(), name='react_app'),
@@ -1,7 +1,95 @@
+import gzip
+import hashlib
 import os
+import threading
+import time
 from django.conf import settings
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, HttpResponseNotModified, Http404, JsonResponse
+from django.utils.http import http_date, parse_http_date_safe
 from django.views.generic import View
+from .metrics import render as render_metrics
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+
+class ShellCache:
+    """
+    The React build's index.html, read once and kept in memory together with
+    its gzip/brotli variants and validators. The file is only stat()ed again
+    every SPA_SHELL_RECHECK_SECONDS and re-read when its mtime changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.shell = None
+        self.checked_at = None
+
+    def get(self):
+        now = time.monotonic()
+        interval = settings.SPA_SHELL_RECHECK_SECONDS
+        if self.checked_at is not None and now - self.checked_at < interval:
+            return self.shell
+        with self.lock:
+            if self.checked_at is None or now - self.checked_at >= interval:
+                self.shell = self.load(self.shell)
+                self.checked_at = now
+        return self.shell
+
+    def load(self, previous):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        if previous is not None and previous['mtime'] == mtime:
+            return previous
+
+        with open(self.path, 'rb') as file:
+            body = file.read()
+        etag = hashlib.md5(body).hexdigest()
+        variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body)
+        return {
+            'mtime': mtime,
+            'etag': etag,
+            'last_modified': http_date(mtime),
+            'variants': variants,
+        }
+
+
+shell_cache = ShellCache(os.path.join(settings.BASE_DIR, 'interface', 'build', 'index.html'))
+
+
+def choose_encoding(accept_encoding, variants):
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+    for encoding in ('br', 'gzip'):
+        if encoding in accepted and encoding in variants:
+            return encoding
+    return 'identity'
+
+
+def csrf_failure(request, reason=''):
+    """JSON 403 for a missing or stale CSRF token, so API clients can refetch it"""
+    return JsonResponse({'error': f'CSRF verification failed: {reason}', 'code': 'csrf_failed'}, status=403)
+
+
+def metrics_view(request):
+    """
+    Prometheus text metrics for all workers. Needs 'Authorization: Bearer
+    <METRICS_TOKEN>' when a token is configured, otherwise a staff session
+    (or DEBUG).
+    """
+    if settings.METRICS_TOKEN:
+        allowed = request.META.get('HTTP_AUTHORIZATION', '') == f'Bearer {settings.METRICS_TOKEN}'
+    else:
+        allowed = settings.DEBUG or request.user.is_staff
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 class ReactAppView(View):
@@ -9,16 +97,10 @@ class ReactAppView(View):
     Serves the React app for all non-API routes.
     This allows React Router to handle client-side routing.
     """
-    
+
     def get(self, request, *args, **kwargs):
-        try:
-            # Path to the React build index.html
-            index_path = os.path.join(settings.BASE_DIR, 'interface', 'build', 'index.html')
-            
-            with open(index_path, 'r', encoding='utf-8') as file:
-                return HttpResponse(file.read(), content_type='text/html')
-                
-        except FileNotFoundError:
+        shell = shell_cache.get()
+        if shell is None:
             # Fallback for development or if build doesn't exist
             return HttpResponse(
                 """
@@ -32,3 +114,26 @@ class ReactAppView(View):
                 """,
                 content_type='text/html'
             )
+
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), shell['variants'])
+        # Each encoding is a different representation, so it gets its own tag
+        etag = f'"{shell["etag"]}"' if encoding == 'identity' else f'"{shell["etag"]}-{encoding}"'
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            not_modified = if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+        else:
+            since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            not_modified = since is not None and int(shell['mtime']) <= since
+
+        response = HttpResponseNotModified() if not_modified else HttpResponse(
+            shell['variants'][encoding], content_type='text/html; charset=utf-8'
+        )
+        if not not_modified and encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = shell['last_modified']
+        # The shell references hashed bundles, so it must always be revalidated
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept-Encoding'
+        return response
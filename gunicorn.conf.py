@@ -0,0 +1,51 @@
+"""
+Gunicorn settings, read automatically by `gunicorn config.wsgi` when started
+from the project root (Procfile, render.yaml). Everything comes from the
+environment so a deploy can be resized without code changes:
+
+  WEB_CONCURRENCY        worker processes (default: 2 x CPUs + 1, at most 8)
+  GUNICORN_THREADS       threads per worker; above 1 switches to gthread
+  GUNICORN_TIMEOUT       seconds before a stuck worker is restarted
+  GUNICORN_KEEPALIVE     seconds an idle client connection is kept open
+  GUNICORN_MAX_REQUESTS  recycle a worker after this many requests (0 = never)
+
+Each worker thread holds its own database connection (unless DB_POOL is
+set), so workers x threads is the connection count to budget for.
+
+With METRICS_DIR set, the hooks below keep the per-worker metrics snapshots
+(config/metrics.py) summing to ever-growing totals: a worker writes its
+final snapshot on the way out, the master folds it into the retired totals,
+and snapshots left by a previous master are cleared at startup.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+accesslog = None
+errorlog = '-'
+
+
+def on_starting(server):
+    if os.environ.get('METRICS_DIR'):
+        from config.metrics import reset
+        os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+        reset(os.environ['METRICS_DIR'])
+
+
+def worker_exit(server, worker):
+    if os.environ.get('METRICS_DIR'):
+        from config.metrics import registry
+        registry.maybe_flush(force=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('METRICS_DIR'):
+        from config.metrics import retire
+        retire(os.environ['METRICS_DIR'], worker.pid)
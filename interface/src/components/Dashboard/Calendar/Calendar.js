@@ -1,12 +1,21 @@
-import { useEffect, useState, useContext, useCallback } from "react"
+import { useEffect, useState, useContext } from "react"
 import UserContext from "../../../context/user-context"
 import { useAuth } from "../../../context/auth-context"
 import { ActivityCalendar } from 'activity-calendar-react'
 import DayActivityForm from "../Forms/DayActivityForm"
 
+// Days shown by the activity calendar, ending today
+const CALENDAR_WINDOW_DAYS = 365
+
+// YYYY-MM-DD in local time, as the API's ?from=/?to= expect
+const formatDay = (date) => {
+    const pad = (n) => String(n).padStart(2, '0')
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`
+}
+
 const Calendar = (props) => {
     const user = useContext(UserContext)
-    const { user: authUser } = useAuth()
+    const { user: authUser, bootstrap, refreshBootstrap } = useAuth()
     
     const [days, setDays] = useState([])
     const [refreshKey, setRefreshKey] = useState(0)
@@ -15,52 +24,81 @@ const Calendar = (props) => {
     const USE_DJANGO_API = process.env.REACT_APP_USE_BACKEND === 'true'
     const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000'
 
-    // Use useCallback to stabilize loadUserData reference for useEffect
-    const loadUserData = useCallback(async () => {
-        try {
-            setIsRefreshing(true)
-            
-            if (USE_DJANGO_API && authUser) {
-                const response = await fetch(`${API_BASE_URL}/api/submissions/`, {
+    // Days logged before this month, inside the calendar's visible window
+    const [earlierDays, setEarlierDays] = useState({ to: null, days: [] })
+
+    // With the backend, this month's submissions come from the bootstrap
+    // response (see auth-context.js); otherwise from localStorage
+    useEffect(() => {
+        if (USE_DJANGO_API && authUser && bootstrap?.submissions) {
+            const formattedDays = [
+                ...earlierDays.days,
+                ...bootstrap.submissions.map(({ day, activity }) => ({ day, activity }))
+            ]
+            setDays(formattedDays)
+            localStorage.setItem(`habify_submissions_${user.user}`, JSON.stringify(formattedDays))
+            return
+        }
+        const submissions = JSON.parse(localStorage.getItem(`habify_submissions_${user.user}`) || '[]')
+        setDays(submissions.map(sub => ({
+            day: sub.day,
+            activity: sub.activity
+        })))
+    }, [authUser, bootstrap, earlierDays, user.user, USE_DJANGO_API, refreshKey])
+
+    // The rest of the visible window is fetched once per month as one bounded
+    // ?from=&to= range, never the whole history
+    useEffect(() => {
+        if (!USE_DJANGO_API || !authUser || !bootstrap?.month) {
+            return
+        }
+        const [year, month] = bootstrap.month.split('-').map(Number)
+        const to = formatDay(new Date(year, month - 1, 0))  // last day of the previous month
+        if (earlierDays.to === to) {
+            return
+        }
+        const windowStart = new Date()
+        windowStart.setDate(windowStart.getDate() - (CALENDAR_WINDOW_DAYS - 1))
+        const from = formatDay(windowStart)
+        if (from > to) {
+            setEarlierDays({ to, days: [] })
+            return
+        }
+
+        let cancelled = false
+        const loadEarlierDays = async () => {
+            const fetched = []
+            let url = `${API_BASE_URL}/api/submissions/?compact=1&from=${from}&to=${to}&page_size=${CALENDAR_WINDOW_DAYS}`
+            while (url) {
+                const response = await fetch(url, {
                     credentials: 'include',
                     headers: { 'Content-Type': 'application/json' }
                 })
-                if (response.ok) {
-                    const data = await response.json()
-                    const formattedDays = data.submissions.map(sub => ({
-                        day: sub.day,
-                        activity: sub.activity
-                    }))
-                    setDays([...formattedDays])
-                    localStorage.setItem(`habify_submissions_${user.user}`, JSON.stringify(formattedDays))
+                if (!response.ok) {
                     return
                 }
+                const data = await response.json()
+                data.submissions.forEach(([day, activity]) => fetched.push({ day, activity }))
+                url = data.next
+            }
+            if (!cancelled) {
+                setEarlierDays({ to, days: fetched.reverse() })
             }
-
-            const submissions = JSON.parse(localStorage.getItem(`habify_submissions_${user.user}`) || '[]')
-            const formattedSubmissions = submissions.map(sub => ({
-                day: sub.day,
-                activity: sub.activity
-            }))
-            setDays([...formattedSubmissions])
-        } catch (error) {
-            const submissions = JSON.parse(localStorage.getItem(`habify_submissions_${user.user}`) || '[]')
-            const formattedSubmissions = submissions.map(sub => ({
-                day: sub.day,
-                activity: sub.activity
-            }))
-            setDays([...formattedSubmissions])
-        } finally {
-            setIsRefreshing(false)
         }
-    }, [authUser, user.user, USE_DJANGO_API, API_BASE_URL])
-
-    useEffect(() => {
-        loadUserData()
-    }, [loadUserData, refreshKey])
+        setIsRefreshing(true)
+        loadEarlierDays()
+            .catch(error => console.warn('Could not load earlier submissions:', error))
+            .finally(() => setIsRefreshing(false))
+        return () => { cancelled = true }
+    }, [authUser, bootstrap, earlierDays.to, USE_DJANGO_API, API_BASE_URL])
 
     const handleSubmissionSuccess = async (submission) => {
-        await loadUserData()
+        if (USE_DJANGO_API && authUser) {
+            // One bootstrap request refreshes the calendar and the stats
+            setIsRefreshing(true)
+            await refreshBootstrap()
+            setIsRefreshing(false)
+        }
         setRefreshKey(prev => prev + 1)
     }
 
@@ -105,7 +143,8 @@ const Calendar = (props) => {
         return streak
     }
 
-    const currentStreak = calculateStreak()
+    // The server's streak when there is one; the calendar may not hold the whole run
+    const currentStreak = bootstrap?.profile ? bootstrap.profile.streak : calculateStreak()
     const successRate = days.length > 0 ? 
         Math.round((days.filter(d => d.activity === 4 || d.activity === 5).length / days.filter(d => d.activity > 0 && d.activity !== 3).length) * 100) : 0
 
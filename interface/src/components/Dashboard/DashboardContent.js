@@ -8,7 +8,7 @@ import { useAuth } from "../../context/auth-context"
 
 const DashboardContent = () => {
     const user = useContext(UserContext)
-    const { user: authUser } = useAuth()
+    const { user: authUser, bootstrap } = useAuth()
     const [profile, setProfile] = useState({
         coins: 100,
         streak: 0,
@@ -16,6 +16,16 @@ const DashboardContent = () => {
     })
 
     useEffect(() => {
+        // With the backend, the stats come from the bootstrap response
+        if (bootstrap?.profile) {
+            setProfile({
+                coins: bootstrap.profile.coins,
+                streak: bootstrap.profile.streak,
+                mult: bootstrap.profile.multiplier
+            })
+            return
+        }
+
         // Initialize or load user profile from localStorage
         const loadProfile = () => {
             const currentUser = authUser?.username || user.user
@@ -47,7 +57,7 @@ const DashboardContent = () => {
         }
 
         loadProfile()
-    }, [authUser, user])
+    }, [authUser, user, bootstrap])
 
     const [disabledBtn, setDisabledBtn] = useState(false)
     const [innerCont, setInnerCont] = useState(<Calendar streak={profile.streak} mult={profile.mult}/>)
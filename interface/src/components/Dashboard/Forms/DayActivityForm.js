@@ -1,6 +1,8 @@
 import { useState, useEffect, useContext } from "react"
 import UserContext from "../../../context/user-context"
 import { useAuth } from "../../../context/auth-context"
+import { newIdempotencyKey } from "../../../utils/idempotency"
+import { fetchWithCSRF } from "../../../utils/csrf"
 
 const DayActivityForm = ({ onSubmissionSuccess }) => {
     const user = useContext(UserContext)
@@ -27,20 +29,6 @@ const DayActivityForm = ({ onSubmissionSuccess }) => {
                 }
     }, [user.user, todayString])
 
-    // Helper function to get CSRF token
-    const getCSRFToken = async () => {
-        try {
-            const response = await fetch(`${API_BASE_URL}/api/csrf/`, {
-                credentials: 'include'
-            })
-            const data = await response.json()
-            return data.csrfToken
-        } catch (error) {
-            console.warn('Failed to get CSRF token:', error)
-            return null
-        }
-    }
-
     const formHandler = async (e) => {
         e.preventDefault()
         
@@ -65,13 +53,11 @@ const DayActivityForm = ({ onSubmissionSuccess }) => {
                 // Submit to Django API
                 console.log('Submitting to Django API:', newSubmission)
                 
-                const csrfToken = await getCSRFToken()
-                console.log('CSRF Token:', csrfToken ? 'Retrieved successfully' : 'Failed to retrieve')
-                const response = await fetch(`${API_BASE_URL}/api/daylog/`, {
+                const response = await fetchWithCSRF(API_BASE_URL, `${API_BASE_URL}/api/daylog/`, {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
-                        'X-CSRFToken': csrfToken,
+                        'Idempotency-Key': newIdempotencyKey(),
                         'Referer': window.location.origin
                     },
                     credentials: 'include',
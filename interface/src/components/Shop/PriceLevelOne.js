@@ -2,6 +2,7 @@ import axios from "axios"
 import UserContext from "../../context/user-context"
 import { useContext, useEffect, useState } from "react"
 import RewardCard from "./RewardCard"
+import { newIdempotencyKey } from "../../utils/idempotency"
 
 const PriceLevelOne = (props) => {
     const rewardTotal = 350
@@ -30,7 +31,7 @@ const PriceLevelOne = (props) => {
             img: props.image,
             title: props.name
         },{
-            headers: {'X-CSRFToken': csrfToken}
+            headers: {'X-CSRFToken': csrfToken, 'Idempotency-Key': newIdempotencyKey()}
         }).then(res => {
             props.setWallet(rewardTotal)
         })
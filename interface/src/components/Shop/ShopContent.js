@@ -1,12 +1,19 @@
-import { useContext, useState } from "react"
+import { useContext, useEffect, useState } from "react"
 import UserContext from "../../context/user-context"
+import { newIdempotencyKey } from "../../utils/idempotency"
+import { fetchWithCSRF } from "../../utils/csrf"
 
 const ShopContent = () => {
     const user = useContext(UserContext)
     const [wallet, setWallet] = useState(user.coins)
 
-    // Sample shop items with varied pricing and categories
-    const shopItems = [
+    // API Configuration
+    const USE_DJANGO_API = process.env.REACT_APP_USE_BACKEND === 'true'
+    const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000'
+
+    // Built-in items for localStorage mode; with the backend the catalog
+    // below replaces them
+    const defaultShopItems = [
         // Pet Companions (150-500 rupees)
         { 
             id: 1, 
@@ -90,11 +97,54 @@ const ShopContent = () => {
         }
     ]
 
+    const [shopItems, setShopItems] = useState(defaultShopItems)
+
+    useEffect(() => {
+        if (!USE_DJANGO_API) {
+            return
+        }
+        // The server answers with an ETag, so revisits are a 304 from the browser cache
+        fetch(`${API_BASE_URL}/api/rewards/catalog/`, { credentials: 'include' })
+            .then(response => response.json())
+            .then(data => setShopItems(data.items.map(item => ({
+                id: item.slug,
+                image: item.img,
+                name: item.title,
+                price: item.price,
+                category: item.category,
+                description: item.description
+            }))))
+            .catch(error => console.warn('Failed to load catalog:', error))
+    }, [USE_DJANGO_API, API_BASE_URL])
+
+    const buyFromApi = async (item) => {
+        const response = await fetchWithCSRF(API_BASE_URL, `${API_BASE_URL}/api/rewards/buyreward/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Idempotency-Key': newIdempotencyKey()
+            },
+            // The price is only checked against the catalog, never charged as sent
+            body: JSON.stringify({ item: item.id, price: item.price })
+        })
+        const data = await response.json()
+        if (!response.ok) {
+            alert(`⚠️ ${data.error}`)
+            return
+        }
+        setWallet(data.coins)
+        alert(`🎉 You purchased ${item.name}! Check your inventory.`)
+    }
+
     const displayWallet = (cost) => {
         setWallet(wallet - cost)
     }
 
     const buyItem = (item) => {
+        if (USE_DJANGO_API) {
+            buyFromApi(item)
+            return
+        }
         if (wallet >= item.price) {
             displayWallet(item.price)
             
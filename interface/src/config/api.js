@@ -1,5 +1,6 @@
 // API Configuration for Habify
 // Supports both Django backend and localStorage fallback
+import { fetchWithCSRF } from '../utils/csrf'
 
 const API_CONFIG = {
     // Set to true to use Django backend, false for localStorage only
@@ -17,7 +18,8 @@ const API_CONFIG = {
         DAYLOG: '/api/daylog/',
         REWARDS: '/api/rewards/',
         BUY_REWARD: '/buyreward/',
-        CSRF: '/api/csrf/'
+        CSRF: '/api/csrf/',
+        BOOTSTRAP: '/api/bootstrap/'
     }
 }
 
@@ -43,19 +45,6 @@ export const apiRequest = async (endpoint, options = {}) => {
         }
     }
 
-    // Get CSRF token for POST/PUT/DELETE requests
-    if (['POST', 'PUT', 'DELETE'].includes(options.method)) {
-        try {
-            const csrfResponse = await fetch(getApiUrl('CSRF'), {
-                credentials: 'include'
-            })
-            const csrfData = await csrfResponse.json()
-            defaultOptions.headers['X-CSRFToken'] = csrfData.csrfToken
-        } catch (error) {
-            console.warn('Failed to get CSRF token:', error)
-        }
-    }
-
     const finalOptions = {
         ...defaultOptions,
         ...options,
@@ -65,7 +54,10 @@ export const apiRequest = async (endpoint, options = {}) => {
         }
     }
 
-    const response = await fetch(url, finalOptions)
+    // Mutating requests reuse the cached CSRF token (see utils/csrf.js)
+    const response = ['POST', 'PUT', 'DELETE'].includes(options.method)
+        ? await fetchWithCSRF(API_CONFIG.DJANGO_BASE_URL, url, finalOptions)
+        : await fetch(url, finalOptions)
     
     if (!response.ok) {
         throw new Error(`API request failed: ${response.status} ${response.statusText}`)
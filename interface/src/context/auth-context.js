@@ -1,4 +1,5 @@
-import React, { createContext, useContext, useState, useEffect } from 'react'
+import React, { createContext, useContext, useState, useEffect, useCallback } from 'react'
+import { clearCSRFToken, fetchWithCSRF, setCSRFToken } from '../utils/csrf'
 
 const AuthContext = createContext()
 
@@ -33,55 +34,54 @@ console.log('Auth Context Config:', {
     USING_RELATIVE_URLS: API_BASE_URL === ''
 })
 
-// Helper function to get CSRF token
-const getCSRFToken = async () => {
-    try {
-        const response = await fetch(`${API_BASE_URL}/api/csrf/`, {
-            credentials: 'include'
-        })
-        const data = await response.json()
-        return data.csrfToken
-    } catch (error) {
-        console.warn('Failed to get CSRF token:', error)
-        return null
-    }
-}
-
-// API request helper
+// API request helper. Mutating requests reuse the cached CSRF token (see
+// utils/csrf.js) instead of fetching a new one first.
 const apiRequest = async (endpoint, options = {}) => {
     const url = `${API_BASE_URL}${endpoint}`
-    const defaultOptions = {
+    const finalOptions = {
         credentials: 'include',
+        ...options,
         headers: {
             'Content-Type': 'application/json',
+            ...options.headers
         }
     }
 
-    // Get CSRF token for POST/PUT/DELETE requests
     if (['POST', 'PUT', 'DELETE'].includes(options.method)) {
-        const csrfToken = await getCSRFToken()
-        if (csrfToken) {
-            defaultOptions.headers['X-CSRFToken'] = csrfToken
-        }
+        return fetchWithCSRF(API_BASE_URL, url, finalOptions)
     }
-
-    const finalOptions = {
-        ...defaultOptions,
-        ...options,
-        headers: {
-            ...defaultOptions.headers,
-            ...options.headers
-        }
-    }
-
-    const response = await fetch(url, finalOptions)
-    return response
+    return fetch(url, finalOptions)
 }
 
 export const AuthProvider = ({ children }) => {
     const [user, setUser] = useState(null)
     const [isLoading, setIsLoading] = useState(false)
     const [error, setError] = useState('')
+    const [bootstrap, setBootstrap] = useState(null)
+
+    // One request for the CSRF token, the session user, dashboard stats,
+    // this month's submissions and owned rewards. Made on load, after login
+    // and signup, and by components (refreshBootstrap) after a check-in.
+    const loadBootstrap = useCallback(() => {
+        if (!USE_DJANGO_API) {
+            return Promise.resolve(null)
+        }
+        return fetch(`${API_BASE_URL}/api/bootstrap/`, { credentials: 'include' })
+            .then(response => response.json())
+            .then(data => {
+                setCSRFToken(data.csrfToken)
+                setBootstrap(data)
+                return data
+            })
+            .catch(err => {
+                console.warn('Bootstrap request failed:', err)
+                return null
+            })
+    }, [])
+
+    useEffect(() => {
+        loadBootstrap()
+    }, [loadBootstrap])
 
     // Check for existing user session on app load
     useEffect(() => {
@@ -166,6 +166,7 @@ export const AuthProvider = ({ children }) => {
 
                 if (response.ok) {
                     const userData = await response.json()
+                    setCSRFToken(userData.csrfToken)
                     const userSession = {
                         id: userData.id || userData.user_id,
                         username: userData.username,
@@ -177,6 +178,7 @@ export const AuthProvider = ({ children }) => {
 
                     setUser(userSession)
                     localStorage.setItem('habify_user', JSON.stringify(userSession))
+                    loadBootstrap()
                     
                     // Update the hidden input field that App.js checks
                     const usernameInput = document.getElementById('username')
@@ -270,6 +272,7 @@ export const AuthProvider = ({ children }) => {
 
                 if (response.ok) {
                     const newUserData = await response.json()
+                    setCSRFToken(newUserData.csrfToken)
                     const userSession = {
                         id: newUserData.id || newUserData.user_id,
                         username: newUserData.username,
@@ -281,6 +284,7 @@ export const AuthProvider = ({ children }) => {
 
                     setUser(userSession)
                     localStorage.setItem('habify_user', JSON.stringify(userSession))
+                    loadBootstrap()
 
                     // Update the hidden input field that App.js checks
                     const usernameInput = document.getElementById('username')
@@ -363,6 +367,8 @@ export const AuthProvider = ({ children }) => {
         }
 
         // Always clear local session
+        clearCSRFToken()
+        setBootstrap(null)
         setUser(null)
         localStorage.removeItem('habify_user')
         
@@ -509,6 +515,8 @@ export const AuthProvider = ({ children }) => {
 
     const value = {
         user,
+        bootstrap,
+        refreshBootstrap: loadBootstrap,
         isLoading,
         error,
         login,
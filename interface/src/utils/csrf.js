@@ -0,0 +1,61 @@
+// CSRF token reuse. The token stays valid for the whole session, so it is
+// fetched once (from /api/bootstrap/ or /api/csrf/) and sent with every
+// POST. Login and signup rotate it and return the new one; a 403 that
+// mentions CSRF means the token went stale, so fetch it again and retry once.
+let csrfToken = null
+let pending = null
+
+export const setCSRFToken = (token) => {
+    csrfToken = token || null
+}
+
+export const clearCSRFToken = () => {
+    csrfToken = null
+    pending = null
+}
+
+export const getCSRFToken = async (baseUrl = '') => {
+    if (csrfToken) {
+        return csrfToken
+    }
+    if (!pending) {
+        pending = fetch(`${baseUrl}/api/csrf/`, { credentials: 'include' })
+            .then(response => response.json())
+            .then(data => {
+                csrfToken = data.csrfToken
+                return csrfToken
+            })
+            .catch(error => {
+                console.warn('Failed to get CSRF token:', error)
+                return null
+            })
+            .finally(() => {
+                pending = null
+            })
+    }
+    return pending
+}
+
+export const isCSRFFailure = async (response) => {
+    if (response.status !== 403) {
+        return false
+    }
+    const text = await response.clone().text().catch(() => '')
+    return text.includes('CSRF')
+}
+
+// fetch() for a mutating request: adds the cached token and, if the server
+// rejects it as stale, refreshes it and sends the request one more time
+export const fetchWithCSRF = async (baseUrl, url, options = {}) => {
+    const send = async () => fetch(url, {
+        ...options,
+        credentials: 'include',
+        headers: { ...options.headers, 'X-CSRFToken': await getCSRFToken(baseUrl) }
+    })
+    const response = await send()
+    if (await isCSRFFailure(response)) {
+        clearCSRFToken()
+        return send()
+    }
+    return response
+}
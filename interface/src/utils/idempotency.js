@@ -0,0 +1,9 @@
+// Idempotency-Key for a POST that must not run twice (check-ins, purchases).
+// Create one key per user action and send the same key on every retry of it;
+// the server then replays its first response instead of repeating the work.
+export const newIdempotencyKey = () => {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID()
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+}
@@ -4,3 +4,4 @@ from .models import *
 
 admin.site.register(Rewards)
 admin.site.register(StreakBadge)
+admin.site.register(CatalogItem)
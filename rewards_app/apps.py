@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RewardsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rewards_app'
+
+    def ready(self):
+        from . import catalog  # noqa: F401, connects the cache invalidation receivers
@@ -0,0 +1,74 @@
+"""
+The shop catalog, held in process memory. It is loaded from CatalogItem once
+and then only re-read every CATALOG_RECHECK_SECONDS (or straight away in this
+process when an item is saved), so shop page loads and purchase checks don't
+touch the database. The version is a hash of the items, used as the ETag.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from config.views import brotli
+from .models import CatalogItem
+
+ITEM_FIELDS = ('slug', 'title', 'img', 'price', 'category', 'description')
+
+
+class Catalog:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.catalog = None
+        self.checked_at = None
+
+    def get(self):
+        now = time.monotonic()
+        interval = settings.CATALOG_RECHECK_SECONDS
+        if self.checked_at is not None and now - self.checked_at < interval:
+            return self.catalog
+        with self.lock:
+            if self.checked_at is None or now - self.checked_at >= interval:
+                self.catalog = self.load()
+                self.checked_at = now
+        return self.catalog
+
+    def invalidate(self):
+        self.checked_at = None
+
+    def load(self):
+        items = list(CatalogItem.objects.filter(active=True).order_by('position', 'pk').values(*ITEM_FIELDS))
+        version = hashlib.md5(json.dumps(items, sort_keys=True).encode()).hexdigest()[:16]
+        body = json.dumps({'version': version, 'items': items}, separators=(',', ':')).encode()
+        variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body)
+        return {
+            'version': version,
+            'items': {item['slug']: item for item in items},
+            'by_title': {item['title']: item for item in items},
+            'variants': variants,
+        }
+
+
+catalog = Catalog()
+
+
+def find(slug=None, title=None):
+    """The active catalog item with this slug (or, failing that, title), or None"""
+    current = catalog.get()
+    if slug:
+        return current['items'].get(slug)
+    if title:
+        return current['by_title'].get(title)
+    return None
+
+
+@receiver(post_save, sender=CatalogItem)
+@receiver(post_delete, sender=CatalogItem)
+def _catalog_changed(sender, **kwargs):
+    # Other workers notice within CATALOG_RECHECK_SECONDS
+    catalog.invalidate()
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('title', models.CharField(max_length=50)),
+                ('img', models.CharField(max_length=999)),
+                ('price', models.PositiveIntegerField()),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('description', models.CharField(blank=True, max_length=250)),
+                ('position', models.IntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# The pets the shop page listed before the catalog moved server-side
+ITEMS = [
+    ('aquilance', 'Aquilance', '/static/imgs/pets/0.svg', 150, 'Starter Pets', 'A loyal water companion perfect for beginners'),
+    ('pyrogriff', 'Pyrogriff', '/static/imgs/pets/1.svg', 300, 'Fire Pets', 'Majestic fire spirit that boosts your motivation'),
+    ('draven', 'Draven', '/static/imgs/pets/2.svg', 250, 'Shadow Pets', 'Mysterious companion with dark magic abilities'),
+    ('doge', 'Doge', '/static/imgs/pets/3.svg', 100, 'Meme Pets', 'Much wow! Very supportive! Such companion!'),
+    ('starshock', 'Starshock', '/static/imgs/pets/4.svg', 450, 'Electric Pets', 'High-energy companion that sparks your determination'),
+    ('verminator', 'Verminator', '/static/imgs/pets/5.svg', 350, 'Bug Pets', 'Helps you squash bad habits one by one'),
+    ('freddie', 'Freddie', '/static/imgs/pets/6.svg', 200, 'Friendly Pets', 'Your cheerful buddy for tough days'),
+    ('blanco', 'Blanco', '/static/imgs/pets/7.svg', 275, 'Ice Pets', 'Cool-headed companion to keep you calm'),
+    ('petally', 'Petally', '/static/imgs/pets/8.svg', 180, 'Nature Pets', 'Grows stronger as your habits bloom'),
+    ('skiddo', 'Skiddo', '/static/imgs/pets/9.svg', 320, 'Adventure Pets', 'Ready to leap over any obstacle with you'),
+]
+
+
+def seed_catalog(apps, schema_editor):
+    CatalogItem = apps.get_model('rewards_app', 'CatalogItem')
+    CatalogItem.objects.bulk_create([
+        CatalogItem(slug=slug, title=title, img=img, price=price, category=category, description=description, position=index)
+        for index, (slug, title, img, price, category, description) in enumerate(ITEMS)
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards_app', '0002_catalogitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_catalog, migrations.RunPython.noop),
+    ]
@@ -11,6 +11,22 @@ class Rewards(models.Model):
     def __str__(self):
         return f"{self.user}-{self.title}-{self.price}-{self.img}"
 
+class CatalogItem(models.Model):
+    """
+    A reward the shop sells. Served from the in-process copy in
+    rewards_app/catalog.py; BuyReward charges the price stored here.
+    """
+    slug = models.SlugField(max_length=50, unique=True)
+    title = models.CharField(max_length=50)
+    img = models.CharField(max_length=999)
+    price = models.PositiveIntegerField()
+    category = models.CharField(max_length=50, blank=True)
+    description = models.CharField(max_length=250, blank=True)
+    position = models.IntegerField(default=0)
+    active = models.BooleanField(default=True)
+    def __str__(self):
+        return f"{self.title}-{self.price}"
+
 class StreakBadge(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     weeks = models.IntegerField(default=0)
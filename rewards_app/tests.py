@@ -1,3 +1,89 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from user_app.benchmark import SCENARIOS, logged_in_clients, seed_users
+from user_app import ledger
+from user_app.models import CoinTransaction, LeaderboardEntry
+from .catalog import catalog
+from .models import CatalogItem, Rewards
 
-# Create your tests here.
+
+class BuyRewardTests(TestCase):
+
+    def setUp(self):
+        for alias in ('default', 'dashboard', 'idempotency'):
+            caches[alias].clear()
+
+    def test_query_count_is_flat(self):
+        request, budget = SCENARIOS['buyreward']
+        counts = []
+        for prefix, days in (('shallow', 3), ('deep', 400)):
+            pair = logged_in_clients(seed_users(1, days, prefix=prefix))[0]
+            with CaptureQueriesContext(connection) as queries:
+                response = request(*pair)
+            self.assertEqual(response.status_code, 200, response.content)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0], budget)
+
+    def test_cannot_overspend(self):
+        client, user = logged_in_clients(seed_users(1, 0, prefix='poor', coins=5))[0]
+        response = client.post('/api/rewards/buyreward/', {'item': 'doge'}, content_type='application/json')
+        self.assertEqual(response.json(), {'error': 'Not enough coins'})
+        self.assertEqual(ledger.load_balance(user.id), 5)
+        self.assertEqual(CoinTransaction.objects.filter(user=user).aggregate(total=Sum('amount'))['total'], 5)
+
+    def test_user_without_a_profile_can_buy(self):
+        user = User.objects.create_user('noprofile', password='pw')
+        ledger.post(user.id, 150, CoinTransaction.GRANT)
+        self.client.force_login(user)
+        response = self.client.post('/api/rewards/buyreward/', {'item': 'doge'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['coins'], 50)
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).streak, 0)
+
+    def test_retry_with_idempotency_key_charges_once(self):
+        client, user = logged_in_clients(seed_users(1, 0, prefix='retry', coins=150))[0]
+        buy = lambda item: client.post(
+            '/api/rewards/buyreward/', {'item': item},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='purchase-1'
+        )
+        first = buy('doge')
+        caches['idempotency'].clear()  # the replay must also work from the table
+        retry = buy('doge')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(ledger.load_balance(user.id), 50)
+        self.assertEqual(Rewards.objects.filter(user=user).count(), 1)
+        self.assertEqual(buy('draven').status_code, 422)
+
+    def test_price_comes_from_the_catalog(self):
+        client, user = logged_in_clients(seed_users(1, 0, prefix='cheat', coins=1000))[0]
+        response = client.post('/api/rewards/buyreward/', {'item': 'doge', 'img': 'x.svg', 'title': 'X'}, content_type='application/json')
+        self.assertEqual(response.json()['reward']['price'], 100)
+        self.assertEqual(client.post('/api/rewards/buyreward/', {'item': 'doge', 'price': 1}, content_type='application/json').status_code, 409)
+        self.assertEqual(client.post('/api/rewards/buyreward/', {'item': 'nope'}, content_type='application/json').status_code, 400)
+
+
+class CatalogTests(TestCase):
+
+    def test_served_from_memory_with_etag(self):
+        catalog.invalidate()
+        self.client.get('/api/rewards/catalog/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/rewards/catalog/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/rewards/catalog/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_edit_changes_the_version(self):
+        before = self.client.get('/api/rewards/catalog/').json()
+        CatalogItem.objects.filter(slug='doge').update(price=120)
+        CatalogItem.objects.get(slug='doge').save()  # fires the invalidation signal
+        after = self.client.get('/api/rewards/catalog/').json()
+        self.assertNotEqual(before['version'], after['version'])
+        self.assertEqual([i['price'] for i in after['items'] if i['slug'] == 'doge'], [120])
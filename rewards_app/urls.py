@@ -3,6 +3,7 @@ from . import views
 app_name = 'rewards_app'
 
 urlpatterns = [
-    path('api/rewards/', views.RewardsView.as_view()),
-    path('buyreward/', views.BuyReward),
+    path('api/rewards/', views.RewardsView.as_view(), name="rewards"),
+    path('catalog/', views.get_catalog, name="catalog"),
+    path('buyreward/', views.BuyReward, name="buyreward"),
 ]
\ No newline at end of file
@@ -1,31 +1,93 @@
-from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view
 from rest_framework import generics
 from .serializers import *
 from .models import *
 from user_app.models import *
+from user_app.dashboard import invalidate_dashboard
+from user_app.idempotency import idempotent
+from user_app import leaderboard, ledger
+from config.views import choose_encoding
+from . import catalog
 # Create your views here.
 
 
 class RewardsView(generics.ListAPIView):
-    queryset = Rewards.objects.all()
     serializer_class = ShopSerializer
 
+    def get_queryset(self):
+        if self.request.user.is_authenticated:
+            return Rewards.objects.filter(user=self.request.user).select_related('user')
+        return Rewards.objects.none()
+
+@require_GET
+def get_catalog(request):
+    """
+    The shop catalog from process memory: {"version", "items": [...]}. Sends
+    an ETag and answers If-None-Match with 304; needs no database query.
+    """
+    current = catalog.catalog.get()
+    encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), current['variants'])
+    etag = f'"{current["version"]}"' if encoding == 'identity' else f'"{current["version"]}-{encoding}"'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(current['variants'][encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
 @api_view(['POST'])
+@idempotent('buyreward')
 def BuyReward(request):
-    if request.method == "POST":
-        print(request.data)
-        price = request.data['price']
-        customer = User.objects.get(username=request.data['user'])
-        profile = Profile.objects.get(user=customer)
-        print(profile.coins, '=========')
-        if int(profile.coins) >= price:
-            profile.coins -= price
-            reward = Rewards.objects.create(
-                price = price,
-                img = request.data['img'],
-                user = customer,
-                title = request.data['title']
-            )
-            profile.save()
-    return render(request, 'index.html')
\ No newline at end of file
+    """
+    Spend coins on a catalog item: {"item": "<slug>"}. Price, title and image
+    come from the catalog, never from the request; a "price" the client
+    displayed is only compared, so a changed price gets 409 instead of a
+    surprise charge. The price is debited through the coin ledger, which
+    refuses (and reverses) a charge the balance does not cover, so
+    concurrent purchases never overdraw; the profile is only locked for the
+    balance check, after the charge is inserted.
+    Send an Idempotency-Key header to make retries safe.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    # Older clients send only the item's title
+    item = catalog.find(slug=request.data.get('item'), title=request.data.get('title'))
+    if item is None:
+        return JsonResponse({'error': 'Unknown reward'}, status=400)
+    price = item['price']
+    expected = request.data.get('price')
+    if expected is not None and str(expected) != str(price):
+        return JsonResponse({'error': 'Price has changed', 'price': price}, status=409)
+
+    customer = request.user
+    # Read before charging: nothing after the debit may fail on a missing Profile
+    streak = Profile.objects.filter(user=customer).values_list('streak', flat=True).first() or 0
+    coins = ledger.debit(customer.id, price, CoinTransaction.SPEND, item['slug'])
+    if coins is None:
+        return JsonResponse({'error': 'Not enough coins'}, status=400)
+    try:
+        reward = Rewards.objects.create(
+            price = price,
+            img = item['img'],
+            user = customer,
+            title = item['title']
+        )
+    except Exception:
+        ledger.post(customer.id, price, CoinTransaction.REVERSAL, item['slug'])
+        raise
+
+    invalidate_dashboard(customer.id)
+    leaderboard.update_entry(customer.id, customer.username, streak, coins)
+    return JsonResponse({
+        'success': True,
+        'reward': {'id': reward.id, 'item': item['slug'], 'title': reward.title, 'img': reward.img, 'price': reward.price},
+        'coins': coins
+    })
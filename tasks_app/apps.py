@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TasksAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tasks_app'
+
+    def ready(self):
+        # Each app's tasks.py registers its handlers with tasks_app.registry
+        autodiscover_modules('tasks')
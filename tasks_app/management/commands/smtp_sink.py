@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from tasks_app.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = "Run a stand-in SMTP server that prints every message it receives, for trying the mail worker locally"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(port=options['port']).start()
+        self.stdout.write(
+            f"Listening on {sink.host}:{sink.port}. Run the worker with EMAIL_BACKEND="
+            f"django.core.mail.backends.smtp.EmailBackend EMAIL_HOST={sink.host} "
+            f"EMAIL_PORT={sink.port} EMAIL_USE_TLS=False"
+        )
+        shown = 0
+        try:
+            while True:
+                time.sleep(0.5)
+                for message in sink.messages[shown:]:
+                    self.stdout.write(f"--- connection {message['connection']}: {message['from']} -> {', '.join(message['to'])}")
+                    self.stdout.write(message['data'])
+                shown = len(sink.messages)
+        except KeyboardInterrupt:
+            sink.stop()
@@ -0,0 +1,46 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from tasks_app import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background tasks (mail, notifications): claim due tasks in "
+        "batches, run them and retry failures with exponential backoff. Daily "
+        "jobs (e.g. streak expiry when STREAK_EXPIRY_AT is set) are enqueued "
+        "for their next run. Runs until stopped (SIGTERM finishes the current batch first) unless --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the due tasks, then exit")
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_BATCH_SIZE, help="Tasks claimed per round")
+        parser.add_argument('--poll-interval', type=float, default=settings.TASK_POLL_SECONDS,
+                            help="Seconds to sleep when no task is due")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        check_schedule = True  # at startup and after every round that ran tasks
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        while not self.stopping:
+            close_old_connections()  # long-running process: honour CONN_MAX_AGE and health checks
+            if check_schedule:
+                registry.schedule_due()
+            tasks = registry.claim(options['batch_size'])
+            check_schedule = bool(tasks)
+            if tasks:
+                succeeded, errored = registry.run(tasks)
+                if options['verbosity'] >= 1:
+                    self.stdout.write(f"Ran {len(tasks)} task(s): {succeeded} succeeded, {errored} errored")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils import timezone
+
+# Create your models here.
+
+class Task(models.Model):
+    """
+    A queued background job, run by `manage.py worker`. Finished tasks are
+    deleted; failed ones are retried with backoff until max_attempts, then
+    kept with status 'failed' for inspection.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+    def __str__(self):
+        return f"{self.name}, {self.status}, attempt {self.attempts}"
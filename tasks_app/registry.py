@@ -0,0 +1,143 @@
+"""
+Task registration, enqueueing and the worker's claim/run cycle.
+
+Handlers are plain functions registered under a name. A batch handler gets
+the payloads of every claimed task with its name at once (so e.g. mail can
+share one SMTP connection) and returns one error per payload, None for
+success. enqueue() is a single INSERT; inside a transaction the task only
+becomes visible to workers if that transaction commits. Tasks registered
+with daily() are enqueued by the worker for their next time of day.
+"""
+import random
+import traceback
+from datetime import time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Task
+
+# name -> (handler, batch)
+HANDLERS = {}
+
+# name -> time of day (in TIME_ZONE) for tasks the worker runs once a day
+SCHEDULE = {}
+
+
+def register(name, batch=False):
+    def decorator(handler):
+        HANDLERS[name] = (handler, batch)
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    if name not in HANDLERS:
+        raise KeyError(f"No task handler registered as {name!r}")
+    return Task.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )
+
+
+def daily(name, at):
+    """Have the worker run task `name` every day at `at`, an 'HH:MM' string"""
+    SCHEDULE[name] = time.fromisoformat(at)
+
+
+def next_run(at, now):
+    """The first moment at or after `now` with local time of day `at`"""
+    run_at = timezone.localtime(now).replace(hour=at.hour, minute=at.minute, second=0, microsecond=0)
+    return run_at if run_at >= now else run_at + timedelta(days=1)
+
+
+def schedule_due():
+    """
+    Enqueue the next run of each daily task that has no queued or running
+    task yet. The worker calls this between rounds, so a finished run is
+    followed by the next day's. Two workers racing here can enqueue a run
+    twice; daily tasks should be safe to repeat.
+    """
+    if not SCHEDULE:
+        return
+    now = timezone.now()
+    pending = set(
+        Task.objects.filter(name__in=SCHEDULE, status__in=(Task.QUEUED, Task.RUNNING))
+        .values_list('name', flat=True)
+    )
+    for name, at in SCHEDULE.items():
+        if name not in pending:
+            enqueue(name, delay=(next_run(at, now) - now).total_seconds())
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: exponential with jitter, capped"""
+    delay = min(settings.TASK_RETRY_MAX_SECONDS, settings.TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(limit):
+    """
+    Mark up to `limit` due tasks as running and return them. Tasks left
+    running longer than TASK_LOCK_TIMEOUT_SECONDS belong to a worker that
+    died and are claimed again. On Postgres, workers skip each other's locked
+    rows, so several can run side by side.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT_SECONDS)
+    due = Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, locked_at__lt=stale)
+    with transaction.atomic():
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True).filter(due)
+            .order_by('run_at').values_list('id', flat=True)[:limit]
+        )
+        Task.objects.filter(id__in=ids).update(status=Task.RUNNING, locked_at=now, attempts=F('attempts') + 1)
+    return list(Task.objects.filter(id__in=ids).order_by('run_at'))
+
+
+def run(tasks):
+    """
+    Run claimed tasks, grouped by name. Failures are rescheduled with
+    backoff, or marked failed after max_attempts. Returns (succeeded, errored).
+    """
+    groups = {}
+    for task in tasks:
+        groups.setdefault(task.name, []).append(task)
+
+    done, retry = [], []
+    for name, group in groups.items():
+        handler, batch = HANDLERS.get(name, (None, False))
+        if handler is None:
+            errors = [f"No task handler registered as {name!r}"] * len(group)
+        elif batch:
+            try:
+                errors = handler([task.payload for task in group])
+            except Exception:
+                errors = [traceback.format_exc()] * len(group)
+        else:
+            errors = []
+            for task in group:
+                try:
+                    handler(task.payload)
+                    errors.append(None)
+                except Exception:
+                    errors.append(traceback.format_exc())
+
+        for task, error in zip(group, errors):
+            if error is None:
+                done.append(task.id)
+            else:
+                task.last_error = str(error)[-4000:]
+                task.locked_at = None
+                if task.attempts >= task.max_attempts:
+                    task.status = Task.FAILED
+                else:
+                    task.status = Task.QUEUED
+                    task.run_at = timezone.now() + timedelta(seconds=backoff(task.attempts))
+                retry.append(task)
+
+    Task.objects.filter(id__in=done).delete()
+    Task.objects.bulk_update(retry, ['status', 'run_at', 'locked_at', 'last_error'])
+    return len(done), len(retry)
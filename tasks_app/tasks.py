@@ -0,0 +1,41 @@
+"""
+Outgoing mail. enqueue_mail() queues a message; the worker sends every
+claimed message over one SMTP connection.
+"""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from .registry import enqueue, register
+
+
+def enqueue_mail(subject, body, to, from_email=None):
+    return enqueue('send_mail', {
+        'subject': subject,
+        'body': body,
+        'to': list(to),
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+    })
+
+
+def send_messages(messages):
+    """
+    Send EmailMessages over a single connection. Returns one error (or None)
+    per message, so one bad address doesn't fail the rest of the batch.
+    """
+    errors = []
+    with get_connection() as connection:
+        for message in messages:
+            message.connection = connection
+            try:
+                message.send()
+                errors.append(None)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    return errors
+
+
+@register('send_mail', batch=True)
+def send_mail_batch(payloads):
+    return send_messages([
+        EmailMessage(payload['subject'], payload['body'], payload['from_email'], payload['to'])
+        for payload in payloads
+    ])
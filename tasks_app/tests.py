@@ -0,0 +1,86 @@
+from datetime import timedelta
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from user_app.benchmark import seed_users
+from .models import Task
+from .registry import HANDLERS, SCHEDULE, daily, enqueue, register
+from .smtp_sink import SMTPSink
+from .tasks import enqueue_mail
+
+attempts = []
+
+
+@register('test_flaky')
+def flaky(payload):
+    attempts.append(payload)
+    if len(attempts) < payload['fail_times'] + 1:
+        raise ConnectionError('try again')
+
+
+class WorkerTests(TestCase):
+
+    def work(self):
+        call_command('worker', once=True, verbosity=0)
+
+    def test_mail_is_sent_by_the_worker(self):
+        enqueue_mail('Hi', 'Body', ['a@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.work()
+        self.assertEqual([m.to for m in mail.outbox], [['a@example.com']])
+        self.assertFalse(Task.objects.exclude(name__in=SCHEDULE).exists())  # daily jobs stay queued
+
+    def test_failures_back_off_then_give_up(self):
+        attempts.clear()
+        task = enqueue('test_flaky', {'fail_times': 5}, max_attempts=2)
+        self.work()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=20))
+        self.assertIn('ConnectionError', task.last_error)
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        self.work()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    def test_unknown_task_names_are_refused(self):
+        self.assertNotIn('nope', HANDLERS)
+        with self.assertRaises(KeyError):
+            enqueue('nope')
+
+    def test_mail_batch_shares_one_smtp_connection(self):
+        sink = SMTPSink().start()
+        try:
+            for i in range(5):
+                enqueue_mail(f'Hi {i}', 'Body', [f'user{i}@example.com'])
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                   EMAIL_HOST=sink.host, EMAIL_PORT=sink.port, EMAIL_USE_TLS=False,
+                                   EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+                self.work()
+        finally:
+            sink.stop()
+        self.assertEqual(len(sink.messages), 5)
+        self.assertEqual(sink.connections, 1)
+
+    def test_badge_upgrade_sends_a_notification(self):
+        client_user = seed_users(1, 6, prefix='badge')[0]
+        self.client.force_login(client_user)
+        response = self.client.post('/api/daylog/', {'activity': 5}, content_type='application/json')
+        self.assertTrue(response.json()['data']['badge_upgraded'])
+        self.work()
+        self.assertEqual(mail.outbox[0].to, [client_user.email])
+        self.assertIn('grey', mail.outbox[0].subject)
+
+    def test_daily_task_is_enqueued_for_its_next_run(self):
+        daily('test_flaky', '03:30')
+        try:
+            self.work()
+            self.work()
+        finally:
+            del SCHEDULE['test_flaky']
+        task = Task.objects.get(name='test_flaky')
+        run_at = timezone.localtime(task.run_at)
+        self.assertEqual((run_at.hour, run_at.minute), (3, 30))
+        self.assertLessEqual(task.run_at - timezone.now(), timedelta(days=1))
@@ -5,3 +5,8 @@ from .models import *
 
 admin.site.register(Day)
 admin.site.register(Profile)
+admin.site.register(LeaderboardEntry)
+admin.site.register(IdempotencyKey)
+admin.site.register(MonthlyRollup)
+admin.site.register(CoinTransaction)
+admin.site.register(CoinSnapshot)
@@ -0,0 +1,163 @@
+"""
+Async versions of the read-heavy calendar endpoints, mounted in place of the
+sync ones when ASYNC_API is enabled and the app runs under ASGI (see
+config/asgi.py). They use the async ORM and async cache calls so an ASGI
+worker can keep serving other requests while one waits on the database.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from .dashboard import aget_dashboard
+from .export import EXPORT_FORMATS, aexport_rows, attachment_headers
+from .ledger import aget_balance
+from .models import *
+from .pagination import DayCursorPagination
+from .views import filter_day_range
+
+
+def get_only(view):
+    # django.views.decorators.http.require_GET only wraps sync views in 4.2
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    wrapper.__name__, wrapper.__doc__ = view.__name__, view.__doc__
+    return wrapper
+
+
+async def _request_user(request):
+    # Session and user loads are sync-only in Django 4.2
+    return await sync_to_async(get_user)(request)
+
+
+async def _page(queryset, request):
+    """
+    One forward keyset page of `queryset` (newest day first) using the same
+    opaque cursors as DayCursorPagination, so links from either the sync or
+    the async endpoint work on both. Returns (rows, next_link).
+    """
+    paginator = DayCursorPagination()
+    drf_request = Request(request)
+    page_size = paginator.get_page_size(drf_request)
+    cursor = paginator.decode_cursor(drf_request)
+    if cursor is not None and cursor.reverse:
+        raise NotFound('Backwards cursors are not supported here')
+    if cursor is not None and cursor.position is not None:
+        queryset = queryset.filter(day__lt=cursor.position)
+
+    rows = [row async for row in _rows(queryset.order_by('-day')[:page_size + 1])]
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    paginator.base_url = request.build_absolute_uri()
+    return rows, paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(rows[-1]['day'])))
+
+
+async def _rows(queryset):
+    async for row in queryset.values('day', 'activity', 'notes').aiterator():
+        yield row
+
+
+@get_only
+async def get_user_submissions(request):
+    """Async get_user_submissions: same parameters and response, minus 'previous'"""
+    try:
+        user = await _request_user(request)
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+
+        try:
+            day_logs = filter_day_range(Day.objects.filter(user=user), request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        page, next_link = await _page(day_logs, request)
+        compact = request.GET.get('compact') in ('1', 'true')
+
+        if compact:
+            submissions = [[str(log['day']), log['activity'], log['notes']] for log in page]
+        else:
+            submissions = [{
+                'day': str(log['day']),
+                'activity': log['activity'],
+                'notes': log['notes'],
+                'user': user.username,
+                'timestamp': log['day'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            } for log in page]
+
+        response = {
+            'success': True,
+            'submissions': submissions,
+            'next': next_link,
+            'previous': None,
+        }
+        if compact:
+            response['fields'] = ['day', 'activity', 'notes']
+        if not request.GET.get(DayCursorPagination.cursor_query_param):
+            response['profile'] = await aget_dashboard(user.id)
+        return JsonResponse(response)
+
+    except NotFound:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    except Exception as e:
+        print(f"Error in async get_user_submissions: {str(e)}")
+        return JsonResponse({'error': 'Failed to fetch user submissions'}, status=500)
+
+
+@get_only
+async def get_user_stats(request):
+    user = await _request_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    return JsonResponse({'success': True, 'profile': await aget_dashboard(user.id)})
+
+
+@get_only
+async def get_coin_balance(request):
+    user = await _request_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    return JsonResponse({'success': True, 'coins': await aget_balance(user.id)})
+
+
+@get_only
+async def day_log_list(request):
+    """Async DayLogView: the same cursor-paginated {next, previous, results} body"""
+    user = await _request_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'next': None, 'previous': None, 'results': []})
+    try:
+        page, next_link = await _page(filter_day_range(Day.objects.filter(user=user), request.GET), request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except NotFound:
+        return JsonResponse({'detail': 'Invalid cursor'}, status=404)
+    return JsonResponse({
+        'next': next_link,
+        'previous': None,
+        'results': [{'user': user.username, 'day': str(log['day']), 'activity': log['activity'], 'notes': log['notes']} for log in page]
+    })
+
+
+@get_only
+async def export_history(request):
+    """Async export_history: streams from an async generator instead of a thread"""
+    user = await _request_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+    try:
+        day_logs = filter_day_range(Day.objects.filter(user=user), request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        aexport_rows(day_logs.order_by('day'), export_format),
+        content_type=EXPORT_FORMATS[export_format][0]
+    )
+    return attachment_headers(response, user.username, export_format)
@@ -0,0 +1,272 @@
+"""
+Helpers for the `benchmark` management command and the query-count tests:
+synthetic data seeding, timed request runs and baseline comparison. Also the
+concurrent coin workload behind `benchmark_coins`.
+"""
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from .models import *
+from . import ledger
+from rewards_app.models import StreakBadge
+
+BENCH_PASSWORD = 'bench-password-123'
+
+
+def seed_users(count, history_days, prefix='bench', coins=10 ** 6):
+    """
+    Create `count` users, each with `history_days` consecutive passed days
+    ending yesterday, plus matching Profile, coin ledger, StreakBadge and
+    leaderboard rows.
+    The password is hashed once and shared so seeding stays fast.
+    """
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create([
+        User(username=f'{prefix}{i}', password=password, email=f'{prefix}{i}@example.com')
+        for i in range(count)
+    ])
+    # Not every backend returns primary keys from bulk_create
+    users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+    yesterday = date.today() - timedelta(days=1)
+    Profile.objects.bulk_create([
+        Profile(user=user, coins=coins, streak=history_days, last_updated=yesterday) for user in users
+    ])
+    CoinTransaction.objects.bulk_create([
+        CoinTransaction(user=user, amount=coins, kind=CoinTransaction.GRANT, note='seed') for user in users
+    ])
+    StreakBadge.objects.bulk_create([StreakBadge(user=user) for user in users])
+    LeaderboardEntry.objects.bulk_create([
+        LeaderboardEntry(user=user, username=user.username, streak=history_days, coins=coins) for user in users
+    ])
+    for user in users:
+        Day.objects.bulk_create([
+            Day(user=user, day=yesterday - timedelta(days=offset), activity=5, notes='')
+            for offset in range(history_days)
+        ], batch_size=1000)
+    return users
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(timings, query_counts):
+    """Latency percentiles (ms), throughput and queries per request for one scenario"""
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'rps': round(len(timings) / total, 1) if total else 0.0,
+        'queries_mean': round(sum(query_counts) / len(query_counts), 2) if query_counts else 0,
+        'queries_max': max(query_counts) if query_counts else 0,
+    }
+
+
+# BEGIN/COMMIT/SAVEPOINT/RELEASE/ROLLBACK: how many of these wrap a request
+# depends on whether it already runs inside a transaction (it does in tests,
+# not in the benchmark command), so they are left out of every query count.
+TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+def count_queries(captured):
+    """Queries in a CaptureQueriesContext, not counting transaction control"""
+    return sum(
+        1 for query in captured.captured_queries
+        if not query['sql'].lstrip().upper().startswith(TRANSACTION_CONTROL)
+    )
+
+
+def run_scenario(request, clients, iterations):
+    """
+    Call `request(client, user)` `iterations` times, round-robin over the
+    (client, user) pairs, timing each call and counting its queries.
+    Raises AssertionError on an unexpected response status.
+    """
+    timings, query_counts = [], []
+    for i in range(iterations):
+        client, user = clients[i % len(clients)]
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request(client, user)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise AssertionError(f"{response.status_code} from {response.request['PATH_INFO']}: {response.content[:200]!r}")
+        timings.append(elapsed)
+        query_counts.append(count_queries(queries))
+    return summarize(timings, query_counts)
+
+
+def logged_in_clients(users):
+    clients = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        clients.append((client, user))
+    return clients
+
+
+# name -> (request callable, maximum queries per request). The budgets are
+# independent of history depth: an endpoint exceeding one has picked up an N+1.
+SCENARIOS = {
+    'checkin': (
+        lambda client, user: client.post('/api/daylog/', {'activity': 5, 'notes': 'bench'}, content_type='application/json'),
+        13,
+    ),
+    'submissions': (
+        lambda client, user: client.get('/api/submissions/'),
+        6,
+    ),
+    'daylog': (
+        lambda client, user: client.get('/api/log/'),
+        6,
+    ),
+    'buyreward': (
+        lambda client, user: client.post('/api/rewards/buyreward/', {'item': 'doge'}, content_type='application/json'),
+        12,
+    ),
+    'login': (
+        lambda client, user: client.post('/api/login/', {'username': user.username, 'password': BENCH_PASSWORD}, content_type='application/json'),
+        8,
+    ),
+}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lines describing each scenario against a saved baseline, and the names of
+    scenarios whose p95 grew by more than `tolerance` (e.g. 0.25 = 25%) or
+    whose query count went up.
+    """
+    lines, regressions = [], []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            lines.append(f"{name}: no baseline")
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0.0
+        lines.append(
+            f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms ({change:+.0%}), "
+            f"queries {previous['queries_max']} -> {current['queries_max']}"
+        )
+        if change > tolerance or current['queries_max'] > previous['queries_max']:
+            regressions.append(name)
+    return lines, regressions
+
+
+def load_baseline(path):
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def save_baseline(path, results, settings):
+    with open(path, 'w') as file:
+        json.dump({'settings': settings, 'results': results}, file, indent=2, sort_keys=True)
+
+
+def _profile_earn(user_id, amount):
+    # The locked read-modify-write of Profile.coins used before the ledger
+    with transaction.atomic():
+        profile = Profile.objects.select_for_update().get(user_id=user_id)
+        profile.coins += amount
+        profile.save(update_fields=['coins'])
+    return True
+
+
+def _profile_spend(user_id, amount):
+    with transaction.atomic():
+        profile = Profile.objects.select_for_update().get(user_id=user_id)
+        if profile.coins < amount:
+            return False
+        profile.coins -= amount
+        profile.save(update_fields=['coins'])
+    return True
+
+
+def _ledger_earn(user_id, amount):
+    ledger.post(user_id, amount, CoinTransaction.EARN, 'benchmark')
+    return True
+
+
+def _ledger_spend(user_id, amount):
+    return ledger.debit(user_id, amount, CoinTransaction.SPEND, 'benchmark') is not None
+
+
+# name -> (earn, spend, read balance); earn and spend return whether they applied
+COIN_STRATEGIES = {
+    'profile': (_profile_earn, _profile_spend, lambda user_id: Profile.objects.get(user_id=user_id).coins),
+    'ledger': (_ledger_earn, _ledger_spend, ledger.load_balance),
+}
+
+
+def run_coin_workload(strategy, user_ids, threads, operations, spend_ratio, earn=50, price=100):
+    """
+    Run `threads` threads, each making `operations` random earns or spends
+    (with probability `spend_ratio`) for users drawn from `user_ids`, so
+    writers contend on the same users. Returns throughput, latency
+    percentiles, refused spends, failed operations (e.g. lock timeouts) and
+    whether every final balance equals its start plus the applied changes.
+    """
+    earn_coins, spend_coins, read_balance = COIN_STRATEGIES[strategy]
+    start = {user_id: read_balance(user_id) for user_id in user_ids}
+    lock = threading.Lock()
+    timings, applied, counts = [], {user_id: 0 for user_id in user_ids}, {'refused': 0, 'errors': 0}
+
+    def work(seed):
+        rng = random.Random(seed)
+        mine, changes, refused, errors = [], {}, 0, 0
+        try:
+            for _ in range(operations):
+                user_id = rng.choice(user_ids)
+                spend = rng.random() < spend_ratio
+                started = time.perf_counter()
+                try:
+                    done = spend_coins(user_id, price) if spend else earn_coins(user_id, earn)
+                except DatabaseError:
+                    errors += 1
+                    continue
+                mine.append(time.perf_counter() - started)
+                if done:
+                    changes[user_id] = changes.get(user_id, 0) + (-price if spend else earn)
+                else:
+                    refused += 1
+        finally:
+            connection.close()  # this thread's connection
+        with lock:
+            timings.extend(mine)
+            for user_id, change in changes.items():
+                applied[user_id] += change
+            counts['refused'] += refused
+            counts['errors'] += errors
+
+    workers = [threading.Thread(target=work, args=(seed,)) for seed in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'operations': len(timings),
+        'ops_per_s': round(len(timings) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'refused': counts['refused'],
+        'errors': counts['errors'],
+        'consistent': all(read_balance(user_id) == start[user_id] + applied[user_id] for user_id in user_ids),
+    }
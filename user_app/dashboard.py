@@ -0,0 +1,108 @@
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from config.metrics import registry as metrics
+from .models import *
+from .ledger import live_balance
+from rewards_app.models import StreakBadge
+
+# Per-process counters, read through dashboard_cache_stats()
+_counter_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'writes': 0, 'invalidations': 0}
+
+
+def _count(name):
+    with _counter_lock:
+        _counters[name] += 1
+    metrics.increment('habify_dashboard_cache_total', {'result': name})
+
+
+def _cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f"dashboard:{user_id}"
+
+
+def load_dashboard(user_id):
+    """Coins (from the ledger), streak and multiplier for the dashboard"""
+    profile = Profile.objects.filter(user_id=user_id).annotate(balance=live_balance()).values('balance', 'streak').first()
+    if profile is None:
+        return None
+    badge = StreakBadge.objects.filter(user_id=user_id).order_by('pk').values('multiplyer').first()
+    return {
+        'coins': profile['balance'],
+        'streak': profile['streak'],
+        'multiplier': badge['multiplyer'] if badge else 1
+    }
+
+
+def get_dashboard(user_id):
+    """Cached dashboard stats; only touches the database on a miss"""
+    stats = _cache().get(_key(user_id))
+    if stats is not None:
+        _count('hits')
+        return stats
+    _count('misses')
+    stats = load_dashboard(user_id)
+    if stats is not None:
+        _cache().set(_key(user_id), stats, settings.DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+async def aload_dashboard(user_id):
+    """Async-ORM twin of load_dashboard() for the ASGI views"""
+    profile = await Profile.objects.filter(user_id=user_id).annotate(balance=live_balance()).values('balance', 'streak').afirst()
+    if profile is None:
+        return None
+    badge = await StreakBadge.objects.filter(user_id=user_id).order_by('pk').values('multiplyer').afirst()
+    return {
+        'coins': profile['balance'],
+        'streak': profile['streak'],
+        'multiplier': badge['multiplyer'] if badge else 1
+    }
+
+
+async def aget_dashboard(user_id):
+    stats = await _cache().aget(_key(user_id))
+    if stats is not None:
+        _count('hits')
+        return stats
+    _count('misses')
+    stats = await aload_dashboard(user_id)
+    if stats is not None:
+        await _cache().aset(_key(user_id), stats, settings.DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def set_dashboard(user_id, coins, streak, multiplier):
+    """Write-through after a view has changed the Profile/StreakBadge rows"""
+    _count('writes')
+    _cache().set(_key(user_id), {
+        'coins': coins,
+        'streak': streak,
+        'multiplier': multiplier
+    }, settings.DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidate_dashboard(user_id):
+    _count('invalidations')
+    _cache().delete(_key(user_id))
+
+
+def invalidate_dashboards(user_ids):
+    """Drop many users' cached stats at once, e.g. after a set-based update"""
+    user_ids = list(user_ids)
+    with _counter_lock:
+        _counters['invalidations'] += len(user_ids)
+    metrics.increment('habify_dashboard_cache_total', {'result': 'invalidations'}, len(user_ids))
+    _cache().delete_many([_key(user_id) for user_id in user_ids])
+
+
+def dashboard_cache_stats():
+    with _counter_lock:
+        stats = dict(_counters)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
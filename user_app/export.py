@@ -0,0 +1,67 @@
+import csv
+import json
+from django.conf import settings
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+EXPORT_FIELDS = ('day', 'activity', 'notes')
+
+
+class _Echo:
+    """File-like object whose write() just returns the line for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _encode(export_format):
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        return lambda row: writer.writerow((row[0].isoformat(), row[1], row[2]))
+    return lambda row: json.dumps({'day': row[0].isoformat(), 'activity': row[1], 'notes': row[2]}) + '\n'
+
+
+def _header(export_format):
+    return csv.writer(_Echo()).writerow(EXPORT_FIELDS) if export_format == 'csv' else ''
+
+
+def export_rows(queryset, export_format):
+    """
+    Yield the export body for `queryset` a chunk at a time. Rows come from
+    .iterator() (a server-side cursor on Postgres), so memory stays flat and
+    the first bytes go out before the query has finished.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    encode = _encode(export_format)
+    lines = [_header(export_format)]
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+async def aexport_rows(queryset, export_format):
+    """Async twin of export_rows() for StreamingHttpResponse under ASGI"""
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    encode = _encode(export_format)
+    lines = [_header(export_format)]
+    # values() rather than values_list(): in Django 4.2 ValuesListIterable
+    # runs its query eagerly, outside aiterator()'s sync thread
+    async for row in queryset.values(*EXPORT_FIELDS).aiterator(chunk_size=chunk_size):
+        lines.append(encode(tuple(row[field] for field in EXPORT_FIELDS)))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def attachment_headers(response, username, export_format):
+    response['Content-Disposition'] = f'attachment; filename="habify-{username}-history.{EXPORT_FORMATS[export_format][1]}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,128 @@
+"""
+Idempotency-Key support for POST endpoints that move coins or streaks.
+
+The first request with a given key claims it by inserting an IdempotencyKey
+row, runs the view and stores the response on that row (and in the
+'idempotency' cache). A retry with the same key gets the stored response back
+without the view running again. Keys are per user and per endpoint.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from .models import *
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+# A claim whose request never finished (the worker died) stops blocking
+# retries after this long
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def _cache():
+    return caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+
+
+def _cache_key(user_id, scope, key):
+    return f"idempotency:{user_id}:{scope}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return JsonResponse({'error': 'Idempotency-Key was already used for a different request'}, status=422)
+    response = JsonResponse(json.loads(stored['body']), status=stored['status_code'], safe=False)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user, scope, key, fingerprint):
+    """
+    Insert the claim row. Returns None when this request now owns the key,
+    otherwise the response to send instead (a replay, or 409 while the first
+    request is still running).
+    """
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(user=user, scope=scope, key=key, fingerprint=fingerprint)
+            return None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+        if existing is None:
+            continue  # expired and pruned in between; try again
+        age = timezone.now() - existing.created
+        if age > timedelta(seconds=settings.IDEMPOTENCY_TTL) or (existing.status_code is None and age > CLAIM_TIMEOUT):
+            existing.delete()
+            continue
+        if existing.status_code is None:
+            return JsonResponse({'error': 'A request with this Idempotency-Key is still being processed'}, status=409)
+        return _replay({'fingerprint': existing.fingerprint, 'status_code': existing.status_code, 'body': existing.body}, fingerprint)
+    return JsonResponse({'error': 'Could not claim Idempotency-Key, please retry'}, status=409)
+
+
+def idempotent(scope):
+    """
+    Decorate a DRF function view (below @api_view) so POSTs carrying an
+    Idempotency-Key header run at most once per user, key and `scope`.
+    Requests without the header, or from anonymous users, run as before.
+    Responses with a 5xx status are not stored, so those can be retried.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(HEADER)
+            if not key or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}, status=400)
+
+            user = request.user
+            fingerprint = _fingerprint(request.data)
+            cache_key = _cache_key(user.id, scope, key)
+            stored = _cache().get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            conflict = _claim(user, scope, key, fingerprint)
+            if conflict is not None:
+                return conflict
+
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                IdempotencyKey.objects.filter(user=user, scope=scope, key=key).delete()
+                raise
+            if response.status_code >= 500:
+                IdempotencyKey.objects.filter(user=user, scope=scope, key=key).delete()
+                return response
+
+            body = response.content.decode(response.charset)
+            IdempotencyKey.objects.filter(user=user, scope=scope, key=key).update(status_code=response.status_code, body=body)
+            _cache().set(cache_key, {
+                'fingerprint': fingerprint, 'status_code': response.status_code, 'body': body
+            }, settings.IDEMPOTENCY_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def prune_expired(batch_size=5000):
+    """Delete stored responses older than IDEMPOTENCY_TTL, in batches. Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_TTL)
+    expired = IdempotencyKey.objects.filter(created__lt=cutoff)
+    deleted = 0
+    while True:
+        keys = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=keys).delete()[0]
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from .models import LeaderboardEntry
+
+# Board name -> (primary score, tie-breaker)
+BOARDS = {
+    'streak': ('streak', 'coins'),
+    'coins': ('coins', 'streak'),
+}
+
+# How many leading entries are kept in the cache per board
+CACHED_TOP = 100
+TOP_CACHE_TIMEOUT = 300
+
+
+def _top_key(board):
+    return f"leaderboard:top:{board}"
+
+
+def ordering(board):
+    """order_by() arguments for a board, matching its index"""
+    primary, secondary = BOARDS[board]
+    return f'-{primary}', f'-{secondary}', 'user_id'
+
+
+def _row(entry):
+    return {'user': entry.username, 'streak': entry.streak, 'coins': entry.coins}
+
+
+def _cached_top(board):
+    top = cache.get(_top_key(board))
+    if top is None:
+        entries = LeaderboardEntry.objects.order_by(*ordering(board))[:CACHED_TOP]
+        top = [_row(entry) for entry in entries]
+        cache.set(_top_key(board), top, TOP_CACHE_TIMEOUT)
+    return top
+
+
+def update_entry(user_id, username, streak, coins):
+    """
+    Upsert a user's leaderboard row after their streak or coins changed.
+
+    The cached top lists are only dropped when this user is on one or now
+    beats its last entry; everything below the cutoff leaves them valid.
+    """
+    LeaderboardEntry.objects.bulk_create(
+        [LeaderboardEntry(user_id=user_id, username=username, streak=streak, coins=coins)],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['username', 'streak', 'coins']
+    )
+    for board, (primary, secondary) in BOARDS.items():
+        top = cache.get(_top_key(board))
+        if top is None:
+            continue
+        score = {'streak': streak, 'coins': coins}
+        on_board = any(row['user'] == username for row in top)
+        if on_board or len(top) < CACHED_TOP or (
+            (score[primary], score[secondary]) >= (top[-1][primary], top[-1][secondary])
+        ):
+            cache.delete(_top_key(board))
+
+
+def reset_streaks(user_ids):
+    """Zero the streak of many entries in one UPDATE and drop the cached top lists"""
+    if LeaderboardEntry.objects.filter(user_id__in=user_ids, streak__gt=0).update(streak=0):
+        cache.delete_many([_top_key(board) for board in BOARDS])
+
+
+def top(board, limit):
+    """The first `limit` entries of a board (served from cache up to CACHED_TOP)"""
+    if limit <= CACHED_TOP:
+        return _cached_top(board)[:limit]
+    entries = LeaderboardEntry.objects.order_by(*ordering(board))[:limit]
+    return [_row(entry) for entry in entries]
+
+
+def rank_of(user_id, board):
+    """
+    1-based rank of a user on a board, or None if they have no entry; ties
+    share a rank. Read off the cached top list when the user is on it,
+    otherwise by counting the entries strictly ahead on the board's index.
+
+    That count is two range scans: higher primary score, then equal primary
+    and higher tie-breaker. Each is index-only (an OR of the two would read
+    the table too), so a deep rank costs a walk over index entries, not rows.
+    """
+    entry = LeaderboardEntry.objects.filter(user_id=user_id).first()
+    if entry is None:
+        return None
+    primary, secondary = BOARDS[board]
+    mine, tie = getattr(entry, primary), getattr(entry, secondary)
+    top = _cached_top(board)
+    if top and (mine, tie) >= (top[-1][primary], top[-1][secondary]):
+        ahead = sum(1 for row in top if (row[primary], row[secondary]) > (mine, tie))
+        return {'rank': ahead + 1, **_row(entry)}
+    ahead = (
+        LeaderboardEntry.objects.filter(**{f'{primary}__gt': mine}).count()
+        + LeaderboardEntry.objects.filter(**{primary: mine, f'{secondary}__gt': tie}).count()
+    )
+    return {'rank': ahead + 1, **_row(entry)}
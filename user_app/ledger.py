@@ -0,0 +1,205 @@
+"""
+The coin ledger. Every change to a user's coins is an inserted
+CoinTransaction row; no writer updates a shared balance row.
+
+A balance is the user's CoinSnapshot plus the transactions after it.
+snapshot_balances() periodically folds new transactions into the snapshots
+(and copies them to Profile.coins), so a balance read sums only the recent
+tail. get_balance() caches the result in the dashboard cache until the
+user's next transaction commits.
+
+Credits are plain inserts. A debit is inserted first and then checked
+against the balance it produced: one that overdraws is undone with a
+reversal row. Concurrent spends therefore never leave a negative balance
+(when two race past zero, both may be undone). The check holds the user's
+Profile row lock, which a check-in holds while it works a failure penalty
+out of the balance, so a penalty cannot land after the check either. The
+check only sees committed rows, so call debit() outside a transaction.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import *
+
+STARTING_COINS = 100
+
+
+def _cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f"coins:{user_id}"
+
+
+def _forget(user_ids):
+    keys = [_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+def post(user_id, amount, kind, note=''):
+    """Append one transaction and return it"""
+    return post_many(user_id, [(amount, kind, note)])[0]
+
+
+def post_many(user_id, entries):
+    """Append (amount, kind, note) transactions for one user with a single INSERT"""
+    rows = CoinTransaction.objects.bulk_create([
+        CoinTransaction(user_id=user_id, amount=amount, kind=kind, note=note) for amount, kind, note in entries
+    ])
+    _forget([user_id])
+    return rows
+
+
+def debit(user_id, amount, kind, note=''):
+    """
+    Take `amount` coins if the balance covers them. Returns the balance
+    left, or None when it did not (the charge is then reversed).
+    """
+    post(user_id, -amount, kind, note)
+    with transaction.atomic():
+        # Wait out a check-in that read the balance before this debit committed
+        list(Profile.objects.select_for_update().filter(user_id=user_id).values_list('pk', flat=True))
+        balance = load_balance(user_id)
+        if balance >= 0:
+            return balance
+        post(user_id, amount, CoinTransaction.REVERSAL, note)
+    return None
+
+
+def live_balance(user_field='user_id'):
+    """
+    Expression for the live balance of the user in `user_field` of the
+    annotated model: snapshot plus later transactions, in the same query.
+    """
+    snapshot = CoinSnapshot.objects.filter(user_id=OuterRef(user_field))
+    tail = (
+        CoinTransaction.objects
+        .filter(user_id=OuterRef(user_field), id__gt=Coalesce(Subquery(
+            CoinSnapshot.objects.filter(user_id=OuterRef('user_id')).values('ledger_id')
+        ), Value(0)))
+        .values('user_id').annotate(total=Sum('amount')).values('total')
+    )
+    return Coalesce(Subquery(snapshot.values('balance')), Value(0)) + Coalesce(Subquery(tail), Value(0))
+
+
+def load_balance(user_id):
+    """The live balance, read from the database in one query"""
+    return User.objects.filter(pk=user_id).annotate(coins=live_balance('pk')).values_list('coins', flat=True).first() or 0
+
+
+def get_balance(user_id):
+    """Cached balance; only touches the database on a miss"""
+    balance = _cache().get(_key(user_id))
+    if balance is None:
+        balance = load_balance(user_id)
+        _cache().set(_key(user_id), balance, settings.COIN_CACHE_TIMEOUT)
+    return balance
+
+
+async def aload_balance(user_id):
+    """Async-ORM twin of load_balance() for the ASGI views"""
+    return await User.objects.filter(pk=user_id).annotate(coins=live_balance('pk')).values_list('coins', flat=True).afirst() or 0
+
+
+async def aget_balance(user_id):
+    balance = await _cache().aget(_key(user_id))
+    if balance is None:
+        balance = await aload_balance(user_id)
+        await _cache().aset(_key(user_id), balance, settings.COIN_CACHE_TIMEOUT)
+    return balance
+
+
+def snapshot_balances(batch_size=1000):
+    """
+    Fold new transactions into the snapshots of the users who have any, and
+    copy the new balances to Profile.coins. Returns how many were written.
+
+    Only transactions older than COIN_SNAPSHOT_LAG_SECONDS are folded, so
+    one whose INSERT had taken an id but not yet committed when the run
+    started is not skipped. Users are handled `batch_size` at a time, each
+    batch in one transaction with its snapshot rows locked; a run that is
+    cut short leaves some snapshots older, never wrong.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.COIN_SNAPSHOT_LAG_SECONDS)
+    upto = CoinTransaction.objects.filter(created__lte=cutoff).order_by('-id').values_list('id', flat=True).first()
+    since = CoinSnapshot.objects.aggregate(since=Max('ledger_id'))['since'] or 0
+    if upto is None or upto <= since:
+        return 0
+
+    user_ids = list(
+        CoinTransaction.objects.filter(id__gt=since, id__lte=upto)
+        .order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    snapshot_id = CoinSnapshot.objects.filter(user_id=OuterRef('user_id')).values('ledger_id')
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            snapshots = {
+                snapshot.user_id: snapshot
+                for snapshot in CoinSnapshot.objects.select_for_update().filter(user_id__in=chunk)
+            }
+            deltas = dict(
+                CoinTransaction.objects
+                .filter(user_id__in=chunk, id__lte=upto, id__gt=Coalesce(Subquery(snapshot_id), Value(0)))
+                .values('user_id').annotate(total=Sum('amount')).values_list('user_id', 'total')
+            )
+            rows = []
+            for user_id in chunk:
+                snapshot = snapshots.get(user_id)
+                if snapshot is not None and snapshot.ledger_id >= upto:
+                    continue  # a concurrent run got further
+                balance = (snapshot.balance if snapshot else 0) + deltas.get(user_id, 0)
+                rows.append(CoinSnapshot(user_id=user_id, balance=balance, ledger_id=upto))
+            CoinSnapshot.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['balance', 'ledger_id', 'taken']
+            )
+            balances = {row.user_id: row.balance for row in rows}
+            profiles = list(Profile.objects.filter(user_id__in=balances).only('pk', 'user_id'))
+            for profile in profiles:
+                profile.coins = balances[profile.user_id]
+            Profile.objects.bulk_update(profiles, ['coins'])
+        written += len(rows)
+    return written
+
+
+def reconcile(batch_size=1000):
+    """
+    Check every snapshot against the sum of the transactions it covers,
+    `batch_size` snapshots per query. Yields (checked, mismatches) per batch,
+    mismatches being (user_id, snapshot balance, ledger sum) tuples.
+    """
+    ledger_sum = (
+        CoinTransaction.objects.filter(user_id=OuterRef('user_id'), id__lte=OuterRef('ledger_id'))
+        .values('user_id').annotate(total=Sum('amount')).values('total')
+    )
+    after = 0
+    while True:
+        rows = list(
+            CoinSnapshot.objects.filter(user_id__gt=after).order_by('user_id')
+            .annotate(ledger_sum=Coalesce(Subquery(ledger_sum), Value(0)))
+            .values_list('user_id', 'balance', 'ledger_sum')[:batch_size]
+        )
+        if not rows:
+            return
+        after = rows[-1][0]
+        yield len(rows), [row for row in rows if row[1] != row[2]]
+
+
+def repair(mismatches):
+    """Rewrite mismatched snapshots (from reconcile()) to the ledger's sum"""
+    snapshots = list(CoinSnapshot.objects.filter(user_id__in=[user_id for user_id, *_ in mismatches]))
+    ledger_sums = {user_id: ledger_sum for user_id, balance, ledger_sum in mismatches}
+    for snapshot in snapshots:
+        snapshot.balance = ledger_sums[snapshot.user_id]
+    CoinSnapshot.objects.bulk_update(snapshots, ['balance'])
+    _forget(ledger_sums)
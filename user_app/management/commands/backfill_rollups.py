@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user_app import rollups
+from user_app.models import Day, MonthlyRollup
+from user_app.streaks import apply_checkin, initial_state
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild MonthlyRollup rows from the Day history by replaying each "
+        "user's days in order through the check-in rules. Existing rollups of "
+        "the users processed are replaced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild this username")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Day rows fetched per database round trip")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Users written per transaction")
+
+    def handle(self, *args, **options):
+        days = Day.objects.order_by('user_id', 'day').values_list('user_id', 'day', 'activity', 'user__date_joined')
+        if options['user']:
+            days = days.filter(user__username=options['user'])
+
+        # Rows arrive sorted by (user, day): one user's months are built at a
+        # time and written out in batches of users
+        pending, months = {}, None
+        current_user, state, run_length = None, None, 0
+        self.users = self.rows = 0
+        for user_id, day, activity, date_joined in days.iterator(chunk_size=options['chunk_size']):
+            if user_id != current_user:
+                if len(pending) >= options['batch_size']:
+                    self.flush(pending)
+                    pending = {}
+                current_user, state, run_length = user_id, initial_state(date_joined), 0
+                months = pending[user_id] = {}
+            run_length += 1
+            coins_earned = apply_checkin(state, day, activity, lambda: run_length > 1)
+            month = rollups.month_of(day)
+            if month not in months:
+                months[month] = MonthlyRollup(user_id=user_id, month=month, activity_counts={})
+            rollups.add_checkin(months[month], None, activity, coins_earned, state['streak'])
+        self.flush(pending)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {self.rows} monthly rollups for {self.users} users"))
+
+    def flush(self, pending):
+        if not pending:
+            return
+        rows = [row for months in pending.values() for row in months.values()]
+        with transaction.atomic():
+            MonthlyRollup.objects.filter(user_id__in=pending).delete()
+            rollups.save(rows)
+        self.users += len(pending)
+        self.rows += len(rows)
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from user_app import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic users and drive the API "
+        "endpoints through the Django test client, reporting p50/p95/p99 latency, "
+        "requests per second and queries per request. Fails when an endpoint "
+        "exceeds its query budget, or regresses against --compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Synthetic users to create")
+        parser.add_argument('--days', type=int, default=365, help="Day history depth per user")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+        parser.add_argument('--scenario', action='append', choices=sorted(benchmark.SCENARIOS),
+                            help="Only run these scenarios (repeatable)")
+        parser.add_argument('--session-engine', action='append', choices=sorted(settings.SESSION_ENGINES),
+                            help="Run the scenarios once per session engine (repeatable; default: the configured one)")
+        parser.add_argument('--save', metavar='PATH', help="Write the results as a JSON baseline")
+        parser.add_argument('--compare', metavar='PATH', help="Compare against a saved JSON baseline")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 growth over the baseline before failing (0.25 = 25%%)")
+
+    def handle(self, *args, **options):
+        names = options['scenario'] or list(benchmark.SCENARIOS)
+
+        # Never touch the configured database: run against a fresh test one.
+        # Every client shares one IP, so login throttling would cut runs short.
+        setup_test_environment()
+        no_throttle = override_settings(THROTTLE_ENABLED=False)
+        no_throttle.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            users = benchmark.seed_users(options['users'], options['days'])
+            results, over_budget = {}, []
+            engines = options['session_engine'] or [None]
+            for engine in engines:
+                # Sessions are created per engine, so log the clients in under it
+                with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[engine] if engine else settings.SESSION_ENGINE):
+                    clients = benchmark.logged_in_clients(users)
+                    for name in names:
+                        label = f'{name}[{engine}]' if engine else name
+                        request, budget = benchmark.SCENARIOS[name]
+                        results[label] = benchmark.run_scenario(request, clients, options['requests'])
+                        if results[label]['queries_max'] > budget:
+                            over_budget.append(f"{label} ({results[label]['queries_max']} > {budget} queries)")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            no_throttle.disable()
+            teardown_test_environment()
+
+        self.stdout.write(f"{'scenario':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<28}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                f"{result['rps']:>10}{result['queries_max']:>10}"
+            )
+
+        regressions = []
+        if options['compare']:
+            lines, regressions = benchmark.compare(results, benchmark.load_baseline(options['compare']), options['tolerance'])
+            for line in lines:
+                self.stdout.write(line)
+        if options['save']:
+            benchmark.save_baseline(options['save'], results, {
+                key: options[key] for key in ('users', 'days', 'requests')
+            })
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if over_budget:
+            raise CommandError(f"Query budget exceeded: {', '.join(over_budget)}")
+        if regressions:
+            raise CommandError(f"Regressed against baseline: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("Benchmark passed"))
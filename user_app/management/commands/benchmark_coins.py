@@ -0,0 +1,62 @@
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from user_app import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent earn/spend throughput of the append-only coin "
+        "ledger with the locked read-modify-write of Profile.coins it "
+        "replaced. Threads hammer a small pool of users on a throwaway test "
+        "database; meaningful numbers need PostgreSQL, as SQLite serialises "
+        "every writer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent writer threads")
+        parser.add_argument('--operations', type=int, default=200, help="Earns or spends per thread")
+        parser.add_argument('--users', type=int, default=4, help="Users the writers share (fewer = more contention)")
+        parser.add_argument('--spend-ratio', type=float, default=0.5, help="Share of operations that are spends")
+        parser.add_argument('--coins', type=int, default=1000, help="Starting balance per user")
+        parser.add_argument('--strategy', action='append', choices=sorted(benchmark.COIN_STRATEGIES),
+                            help="Only run these strategies (repeatable)")
+
+    def handle(self, *args, **options):
+        strategies = options['strategy'] or list(benchmark.COIN_STRATEGIES)
+
+        # Threads need their own connections to one database, which an
+        # in-memory SQLite test database cannot give them
+        temp_dir = None
+        if connection.vendor == 'sqlite':
+            temp_dir = tempfile.TemporaryDirectory()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir.name, 'benchmark_coins.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            users = benchmark.seed_users(options['users'], 0, prefix='coins', coins=options['coins'])
+            user_ids = [user.id for user in users]
+            results = {
+                name: benchmark.run_coin_workload(
+                    name, user_ids, options['threads'], options['operations'], options['spend_ratio']
+                )
+                for name in strategies
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if temp_dir is not None:
+                temp_dir.cleanup()
+
+        self.stdout.write(f"{'strategy':<12}{'ops':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'refused':>9}{'errors':>8}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12}{result['operations']:>8}{result['ops_per_s']:>10}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['refused']:>9}{result['errors']:>8}"
+            )
+        inconsistent = [name for name, result in results.items() if not result['consistent']]
+        if inconsistent:
+            raise CommandError(f"Final balances do not add up for: {', '.join(inconsistent)}")
+        self.stdout.write(self.style.SUCCESS("Balances consistent"))
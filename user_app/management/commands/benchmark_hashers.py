@@ -0,0 +1,60 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+from user_app import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Time make_password/check_password for each configured password hasher "
+        "(and PBKDF2 at several iteration counts) on this machine, to pick "
+        "PASSWORD_HASHER / PBKDF2_ITERATIONS knowingly. Hashers whose optional "
+        "library is not installed are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=10, help="Hashes timed per hasher")
+        parser.add_argument(
+            '--iterations', type=int, action='append',
+            help="PBKDF2 iteration counts to try (repeatable; default: the configured count)"
+        )
+
+    def handle(self, *args, **options):
+        rows = []
+        for name, path in settings.PASSWORD_HASHER_CHOICES.items():
+            if name == 'pbkdf2':
+                for iterations in options['iterations'] or [settings.PBKDF2_ITERATIONS]:
+                    with override_settings(PBKDF2_ITERATIONS=iterations):
+                        rows.append((f'pbkdf2 ({iterations})', self.time_hasher(path, options['rounds'])))
+                continue
+            try:
+                rows.append((name, self.time_hasher(path, options['rounds'])))
+            except ValueError as e:
+                self.stdout.write(f"{name}: skipped ({e})")
+
+        self.stdout.write(f"{'hasher':<20}{'hash p50 ms':>13}{'verify p50 ms':>15}{'logins/s/core':>15}")
+        for label, (hash_ms, verify_ms) in rows:
+            per_second = round(1000 / verify_ms, 1) if verify_ms else 0.0
+            self.stdout.write(f"{label:<20}{hash_ms:>13}{verify_ms:>15}{per_second:>15}")
+        self.stdout.write(f"Preferred hasher: {settings.PASSWORD_HASHER}")
+
+    def time_hasher(self, path, rounds):
+        hasher = import_string(path)()
+        if hasher.library:
+            hasher._load_library()  # ValueError when the optional library is missing
+        hash_timings, verify_timings = [], []
+        for i in range(rounds):
+            password = f'{benchmark.BENCH_PASSWORD}-{i}'
+            start = time.perf_counter()
+            encoded = hasher.encode(password, hasher.salt())
+            hash_timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            hasher.verify(password, encoded)
+            verify_timings.append(time.perf_counter() - start)
+        return (
+            round(benchmark.percentile(sorted(hash_timings), 0.50) * 1000, 1),
+            round(benchmark.percentile(sorted(verify_timings), 0.50) * 1000, 1),
+        )
+
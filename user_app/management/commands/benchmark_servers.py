@@ -0,0 +1,146 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from importlib import import_module
+from user_app import benchmark
+
+PREFIX = 'loadtest'
+
+# mode -> (server command, extra environment)
+SERVERS = {
+    'wsgi': (
+        lambda workers, port: [sys.executable, '-m', 'gunicorn', 'config.wsgi:application',
+                               '--workers', str(workers), '--bind', f'127.0.0.1:{port}'],
+        {'ASYNC_API': 'False'},
+    ),
+    'asgi': (
+        lambda workers, port: [sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+                               '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port),
+                               '--no-access-log'],
+        {'ASYNC_API': 'True'},
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the WSGI (sync gunicorn) and ASGI (uvicorn + ASYNC_API) "
+        "deployments on this machine: start each server with the same worker "
+        "count, drive an endpoint with N concurrent clients and report req/s and "
+        "latency percentiles. Seeds '%s*' users into the configured database and "
+        "removes them afterwards." % PREFIX
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=sorted(SERVERS), help="Only run these modes (repeatable)")
+        parser.add_argument('--workers', type=int, default=1, help="Server worker processes")
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent client connections")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per mode")
+        parser.add_argument('--users', type=int, default=20, help="Synthetic users to seed")
+        parser.add_argument('--days', type=int, default=365, help="Day history depth per user")
+        parser.add_argument('--path', default='/api/submissions/', help="Endpoint to drive")
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f"Users named '{PREFIX}*' already exist; remove them first")
+
+        users = benchmark.seed_users(options['users'], options['days'], prefix=PREFIX)
+        cookies = [self.session_cookie(user) for user in users]
+        try:
+            results = {}
+            for mode in options['mode'] or list(SERVERS):
+                results[mode] = self.run_mode(mode, cookies, options)
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+        self.stdout.write(f"{options['workers']} worker(s), {options['concurrency']} concurrent clients, {options['path']}")
+        self.stdout.write(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<8}{result['rps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['errors']:>8}"
+            )
+        if 'wsgi' in results and 'asgi' in results and results['wsgi']['rps']:
+            self.stdout.write(f"ASGI/WSGI throughput: {results['asgi']['rps'] / results['wsgi']['rps']:.2f}x")
+
+    def session_cookie(self, user):
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.save()
+        return f"{settings.SESSION_COOKIE_NAME}={store.session_key}"
+
+    def run_mode(self, mode, cookies, options):
+        command, extra_env = SERVERS[mode]
+        server = subprocess.Popen(
+            command(options['workers'], options['port']),
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **extra_env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_until_listening(options['port'], server)
+            return self.drive(cookies, options)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_until_listening(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Server exited with status {server.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("Server did not start listening in time")
+
+    def drive(self, cookies, options):
+        port, path = options['port'], options['path']
+
+        def worker(index):
+            # Each client keeps one connection open, like a browser would
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            timings, errors = [], 0
+            for i in range(index, options['requests'], options['concurrency']):
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers={'Cookie': cookies[i % len(cookies)]})
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 400:
+                        errors += 1
+                except (OSError, http.client.HTTPException):
+                    errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                timings.append(time.perf_counter() - start)
+            connection.close()
+            return timings, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            outcomes = list(pool.map(worker, range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+
+        timings = sorted(t for worker_timings, _ in outcomes for t in worker_timings)
+        return {
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(benchmark.percentile(timings, 0.50) * 1000, 1),
+            'p95_ms': round(benchmark.percentile(timings, 0.95) * 1000, 1),
+            'p99_ms': round(benchmark.percentile(timings, 0.99) * 1000, 1),
+            'errors': sum(errors for _, errors in outcomes),
+        }
@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from user_app import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the effective connection settings for a database alias and "
+        "replay N request cycles (request_started, one query, request_finished) "
+        "to count how many opened a new connection and what that cost. Works "
+        "against SQLite or a local Postgres (set DATABASE_URL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Request cycles to simulate")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        config = connection.settings_dict
+        self.stdout.write(f"engine: {config['ENGINE']}")
+        for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'DISABLE_SERVER_SIDE_CURSORS'):
+            self.stdout.write(f"{key}: {config[key]}")
+        self.stdout.write(f"pool: {config['OPTIONS'].get('pool', False)}")
+
+        fresh, reused = [], []
+        for _ in range(options['requests']):
+            request_started.send(sender=self.__class__)
+            before = connection.connection
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            elapsed = time.perf_counter() - start
+            (reused if before is not None and connection.connection is before else fresh).append(elapsed)
+            request_finished.send(sender=self.__class__)
+
+        self.stdout.write(f"new connections: {len(fresh)} of {options['requests']} requests")
+        for label, timings in (('new connection', fresh), ('reused connection', reused)):
+            if timings:
+                timings.sort()
+                self.stdout.write(
+                    f"{label}: p50 {benchmark.percentile(timings, 0.50) * 1000:.3f} ms, "
+                    f"p95 {benchmark.percentile(timings, 0.95) * 1000:.3f} ms"
+                )
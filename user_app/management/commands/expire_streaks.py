@@ -0,0 +1,33 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from user_app.streaks import expire_streaks
+
+
+class Command(BaseCommand):
+    help = (
+        "Reset the streak and badge of every user who did not check in "
+        "yesterday, using batched set-based UPDATEs. Run it nightly from cron, "
+        "or set STREAK_EXPIRY_AT to have the worker run it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Treat this day (YYYY-MM-DD) as today; defaults to the current date")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Profiles reset per transaction")
+
+    def handle(self, *args, **options):
+        today = date.today()
+        if options['date']:
+            try:
+                today = parse_date(options['date'])
+            except ValueError:
+                today = None
+            if today is None:
+                raise CommandError("--date must be a valid YYYY-MM-DD day")
+
+        started = time.perf_counter()
+        expired = expire_streaks(today, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Reset {expired} lapsed streak(s) in {time.perf_counter() - started:.2f}s"
+        ))
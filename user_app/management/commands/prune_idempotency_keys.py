@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from user_app.idempotency import prune_expired
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL (%s seconds)" % settings.IDEMPOTENCY_TTL
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = prune_expired(options['batch_size'])
+        if options['verbosity'] >= 1:
+            self.stdout.write(f"Deleted {deleted} expired idempotency key(s)")
@@ -0,0 +1,49 @@
+import time
+from importlib import import_module
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions. For the db and cached_db engines rows are "
+        "removed in primary-key batches, so a large backlog never holds one "
+        "long lock on the session table. signed_cookies keeps no server state "
+        "and has nothing to prune. Run it from cron, or keep it running with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Sessions deleted per statement")
+        parser.add_argument('--every', type=float, metavar='SECONDS', help="Repeat forever with this pause between runs")
+
+    def handle(self, *args, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        while True:
+            deleted = self.prune(store, options['batch_size'])
+            if deleted is None:
+                self.stdout.write(f"{settings.SESSION_ENGINE} keeps no server-side sessions; nothing to prune")
+                return
+            if options['verbosity'] >= 1:
+                self.stdout.write(f"Deleted {deleted} expired session(s)")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+    def prune(self, store, batch_size):
+        if not issubclass(store, DatabaseSessionStore):
+            try:
+                store.clear_expired()  # e.g. file sessions; cache sessions expire by themselves
+            except NotImplementedError:
+                return None
+            return 0
+
+        sessions = store.get_model_class().objects
+        deleted = 0
+        now = timezone.now()
+        while True:
+            keys = list(sessions.filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            deleted += sessions.filter(pk__in=keys).delete()[0]
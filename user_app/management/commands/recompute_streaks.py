@@ -0,0 +1,150 @@
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user_app.models import Day, LeaderboardEntry, Profile
+from user_app.dashboard import invalidate_dashboard
+from user_app.streaks import apply_checkin, expire_state, initial_state
+from rewards_app.models import StreakBadge
+
+STREAK_FIELDS = ('streak', 'last_updated')
+BADGE_FIELDS = ('weeks', 'color', 'multiplyer')
+
+
+def replay(date_joined, checkins, today):
+    """The streak and badge state a user's (day, activity) history leads to"""
+    state = initial_state(date_joined)
+    for count, (day, activity) in enumerate(checkins, 1):
+        apply_checkin(state, day, activity, lambda: count > 1)
+    expire_state(state, today)
+    return state
+
+
+def diff(row, fields, state):
+    """Copy `fields` of `state` onto `row` (if there is one) and describe what changed"""
+    diffs = []
+    for field in fields if row is not None else ():
+        if getattr(row, field) != state[field]:
+            diffs.append(f"{field} {getattr(row, field)} -> {state[field]}")
+            setattr(row, field, state[field])
+    return diffs
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild Profile streaks and StreakBadge weeks/multipliers from the Day "
+        "history by replaying the check-in rules over each user's days in order, "
+        "then the nightly expiry (a last check-in before yesterday resets the streak). "
+        "Every Profile is checked, so one without any days is reset too. "
+        "Coins are left alone since purchases are not part of the Day history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Print the differences without writing them")
+        parser.add_argument('--user', help="Only recompute this username")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Day rows fetched per database round trip")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Users compared and written per bulk_update")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.checked = self.changed = 0
+        self.today = date.today()
+
+        # Profiles LEFT JOIN their days: a user without days is one row with day None
+        rows = Profile.objects.order_by('user_id', 'user__day__day').values_list(
+            'user_id', 'user__date_joined', 'user__day__day', 'user__day__activity'
+        )
+        if options['user']:
+            rows = rows.filter(user__username=options['user'])
+
+        # Rows arrive sorted by (user, day), so each user is one contiguous run
+        # and only the current user's days are held in memory.
+        pending = {}
+        current_user, date_joined, checkins = None, None, []
+        for user_id, joined, day, activity in rows.iterator(chunk_size=options['chunk_size']):
+            if user_id != current_user:
+                if current_user is not None:
+                    pending[current_user] = replay(date_joined, checkins, self.today)
+                    if len(pending) >= options['batch_size']:
+                        self.flush(pending)
+                        pending = {}
+                current_user, date_joined, checkins = user_id, joined, []
+            if day is not None:
+                checkins.append((day, activity))
+        if current_user is not None:
+            pending[current_user] = replay(date_joined, checkins, self.today)
+        self.flush(pending)
+
+        verb = "would change" if self.dry_run else "updated"
+        self.stdout.write(self.style.SUCCESS(f"Checked {self.checked} users, {verb} {self.changed}"))
+
+    def rows_for(self, user_ids, lock=False):
+        """Profiles and badges by user id, locked in the check-in's order (Profile, then badge)"""
+        profiles = Profile.objects.filter(user_id__in=user_ids).order_by('user_id')
+        badges = StreakBadge.objects.filter(user_id__in=user_ids).order_by('user_id', '-pk')
+        if lock:
+            profiles, badges = profiles.select_for_update(), badges.select_for_update()
+        profiles = {p.user_id: p for p in profiles}
+        lowest = {}
+        for badge in badges:
+            lowest[badge.user_id] = badge  # the lowest pk wins, as in the streak engine
+        return profiles, lowest
+
+    def flush(self, states):
+        if not states:
+            return
+        self.checked += len(states)
+
+        # Compare without locks first; most users have not drifted
+        profiles, badges = self.rows_for(states)
+        drifted = {}
+        for user_id, state in states.items():
+            diffs = diff(profiles.get(user_id), STREAK_FIELDS, state) + diff(badges.get(user_id), BADGE_FIELDS, state)
+            if diffs:
+                drifted[user_id] = diffs
+        usernames = dict(User.objects.filter(id__in=drifted).values_list('id', 'username'))
+
+        if self.dry_run:
+            self.changed += len(drifted)
+            for user_id, diffs in drifted.items():
+                self.stdout.write(f"{usernames.get(user_id, user_id)}: {', '.join(diffs)}")
+            return
+        if not drifted:
+            return
+
+        # Lock the drifted users' rows and replay their days again under the
+        # lock, so a check-in that committed since the first read is not undone
+        with transaction.atomic():
+            profiles, badges = self.rows_for(drifted, lock=True)
+            checkins = {user_id: [] for user_id in drifted}
+            for user_id, day, activity in Day.objects.filter(user_id__in=drifted).order_by('user_id', 'day').values_list('user_id', 'day', 'activity'):
+                checkins[user_id].append((day, activity))
+            joined = dict(User.objects.filter(id__in=drifted).values_list('id', 'date_joined'))
+
+            changed_profiles, changed_badges, changed_users = [], [], []
+            for user_id in drifted:
+                profile, badge = profiles.get(user_id), badges.get(user_id)
+                state = replay(joined[user_id], checkins[user_id], self.today)
+                profile_diffs, badge_diffs = diff(profile, STREAK_FIELDS, state), diff(badge, BADGE_FIELDS, state)
+                if profile_diffs:
+                    changed_profiles.append(profile)
+                if badge_diffs:
+                    changed_badges.append(badge)
+                diffs = profile_diffs + badge_diffs
+                if not diffs:
+                    continue
+                changed_users.append(user_id)
+                if self.verbosity > 1:
+                    self.stdout.write(f"{usernames.get(user_id, user_id)}: {', '.join(diffs)}")
+
+            Profile.objects.bulk_update(changed_profiles, STREAK_FIELDS)
+            StreakBadge.objects.bulk_update(changed_badges, BADGE_FIELDS)
+            # Users without a leaderboard row simply match nothing here
+            LeaderboardEntry.objects.bulk_update(
+                [LeaderboardEntry(user_id=p.user_id, streak=p.streak) for p in changed_profiles],
+                ['streak']
+            )
+        self.changed += len(changed_users)
+        for user_id in changed_users:
+            invalidate_dashboard(user_id)
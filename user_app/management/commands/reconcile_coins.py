@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from user_app import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every coin balance snapshot against the ledger transactions it "
+        "covers, in chunks of users. Exits with an error when any differ, "
+        "unless --fix rewrites those snapshots from the ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Snapshots checked per query")
+        parser.add_argument('--fix', action='store_true', help="Rewrite mismatched snapshots to the ledger's sum")
+
+    def handle(self, *args, **options):
+        checked, mismatched = 0, 0
+        for count, mismatches in ledger.reconcile(options['batch_size']):
+            checked += count
+            mismatched += len(mismatches)
+            for user_id, balance, ledger_sum in mismatches:
+                self.stdout.write(f"user {user_id}: snapshot {balance}, ledger {ledger_sum}")
+            if mismatches and options['fix']:
+                ledger.repair(mismatches)
+
+        if mismatched and not options['fix']:
+            raise CommandError(f"{mismatched} of {checked} snapshot(s) do not match the ledger")
+        verb = 'repaired' if mismatched else 'mismatched'
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} snapshot(s), {mismatched} {verb}"))
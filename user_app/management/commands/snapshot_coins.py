@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from user_app.ledger import snapshot_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold new coin ledger transactions into the users' balance snapshots "
+        "(and Profile.coins), so balance reads only sum the recent tail. The "
+        "worker runs it daily at COIN_SNAPSHOT_AT; with that empty, run it "
+        "from cron or keep it running with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Users snapshotted per transaction")
+        parser.add_argument('--every', type=float, metavar='SECONDS', help="Repeat forever with this pause between runs")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            written = snapshot_balances(options['batch_size'])
+            if options['verbosity'] >= 1:
+                self.stdout.write(f"Snapshotted {written} balance(s) in {time.perf_counter() - started:.2f}s")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
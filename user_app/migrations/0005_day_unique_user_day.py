@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:46
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_days(apps, schema_editor):
+    # Racing requests could insert several rows for the same (user, day);
+    # keep the most recently written one so the unique constraint can be added.
+    Day = apps.get_model('user_app', 'Day')
+    duplicates = (
+        Day.objects.values('user_id', 'day')
+        .annotate(keep_id=Max('id'), rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicates.iterator():
+        Day.objects.filter(user_id=dup['user_id'], day=dup['day']).exclude(id=dup['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0004_alter_profile_pfp'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='day',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_user_day'),
+        ),
+    ]
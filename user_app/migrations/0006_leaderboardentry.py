@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_leaderboard(apps, schema_editor):
+    Profile = apps.get_model('user_app', 'Profile')
+    LeaderboardEntry = apps.get_model('user_app', 'LeaderboardEntry')
+    profiles = Profile.objects.filter(user__isnull=False).values_list('user_id', 'user__username', 'streak', 'coins')
+    batch = []
+    for user_id, username, streak, coins in profiles.iterator(chunk_size=2000):
+        batch.append(LeaderboardEntry(user_id=user_id, username=username, streak=streak, coins=coins))
+        if len(batch) >= 2000:
+            LeaderboardEntry.objects.bulk_create(batch)
+            batch = []
+    LeaderboardEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_app', '0005_day_unique_user_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150)),
+                ('streak', models.IntegerField(default=0)),
+                ('coins', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(models.OrderBy(models.F('streak'), descending=True), models.OrderBy(models.F('coins'), descending=True), name='leaderboard_streak_idx'), models.Index(models.OrderBy(models.F('coins'), descending=True), models.OrderBy(models.F('streak'), descending=True), name='leaderboard_coins_idx')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0008_monthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('streak__gt', 0)), fields=['last_updated'], name='profile_live_streak_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_balances(apps, schema_editor):
+    # Each existing balance becomes the first entry of its user's ledger
+    Profile = apps.get_model('user_app', 'Profile')
+    CoinTransaction = apps.get_model('user_app', 'CoinTransaction')
+    balances = Profile.objects.filter(user__isnull=False).exclude(coins=0).order_by('pk').values_list('user_id', 'coins')
+    batch = []
+    for user_id, coins in balances.iterator(chunk_size=5000):
+        batch.append(CoinTransaction(user_id=user_id, amount=coins, kind='grant', note='opening balance'))
+        if len(batch) == 5000:
+            CoinTransaction.objects.bulk_create(batch)
+            batch = []
+    CoinTransaction.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('user_app', '0009_profile_live_streak_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoinSnapshot',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('balance', models.IntegerField()),
+                ('ledger_id', models.BigIntegerField(db_index=True)),
+                ('taken', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CoinTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('kind', models.CharField(choices=[('grant', 'Grant'), ('earn', 'Earn'), ('penalty', 'Penalty'), ('spend', 'Spend'), ('reversal', 'Reversal')], max_length=10)),
+                ('note', models.CharField(blank=True, max_length=100)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='coin_ledger_user_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0010_coin_ledger'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='leaderboard_streak_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='leaderboard_coins_idx',
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(models.OrderBy(models.F('streak'), descending=True), models.OrderBy(models.F('coins'), descending=True), models.F('user'), name='leaderboard_streak_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(models.OrderBy(models.F('coins'), descending=True), models.OrderBy(models.F('streak'), descending=True), models.F('user'), name='leaderboard_coins_idx'),
+        ),
+    ]
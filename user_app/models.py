@@ -7,14 +7,118 @@ class Day(models.Model):
     day = models.DateField(default=datetime.now, blank=True)
     activity = models.IntegerField(default=0)
     notes = models.CharField(max_length=250)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_user_day'),
+        ]
     def __str__(self):
         return f"{self.user}, {self.day}, {self.activity}"
 
 class Profile(models.Model):
     user = models.OneToOneField(User, null=True, on_delete=models.CASCADE)
     streak = models.IntegerField(default=0)
-    coins = models.IntegerField(default=0)
+    coins = models.IntegerField(default=0)  # as of the last ledger snapshot; see user_app/ledger.py
     pfp = models.CharField(max_length=100, default='/static/imgs/pets/0.svg', blank=True, null=True)
     last_updated = models.DateField(default=datetime.now, blank=True)
+    class Meta:
+        indexes = [
+            # Live streaks by last check-in, for the nightly expiry (see streaks.expire_streaks)
+            models.Index(fields=['last_updated'], condition=models.Q(streak__gt=0), name='profile_live_streak_idx'),
+        ]
+    def __str__(self):
+        return f"{self.user}, {self.streak} days, {self.coins} coins"
+
+class LeaderboardEntry(models.Model):
+    """
+    Denormalized copy of each user's streak and coins, kept current by the
+    views that change them, so top-N and rank queries are index range scans.
+    """
+    user = models.OneToOneField(User, primary_key=True, on_delete=models.CASCADE)
+    username = models.CharField(max_length=150)
+    streak = models.IntegerField(default=0)
+    coins = models.IntegerField(default=0)
+    class Meta:
+        indexes = [
+            # leaderboard.ordering(): top-N reads and rank counts stay inside the index
+            models.Index(models.F('streak').desc(), models.F('coins').desc(), models.F('user'), name='leaderboard_streak_idx'),
+            models.Index(models.F('coins').desc(), models.F('streak').desc(), models.F('user'), name='leaderboard_coins_idx'),
+        ]
+    def __str__(self):
+        return f"{self.username}, {self.streak} days, {self.coins} coins"
+
+class IdempotencyKey(models.Model):
+    """
+    The response a POST with an Idempotency-Key header produced, replayed for
+    retries of the same request until it is IDEMPOTENCY_TTL seconds old.
+    status_code is null while the first request is still being handled.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    scope = models.CharField(max_length=32)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    body = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+    def __str__(self):
+        return f"{self.user}, {self.scope}, {self.key}"
+
+class MonthlyRollup(models.Model):
+    """
+    One user's check-ins for one calendar month, kept current by the streak
+    engine (see user_app/rollups.py) so summaries read O(months) rows.
+    activity_counts maps each activity value (as a string) to its day count;
+    longest_streak is the highest running streak reached during the month.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()  # first day of the month
+    days_logged = models.IntegerField(default=0)
+    activity_counts = models.JSONField(default=dict)
+    longest_streak = models.IntegerField(default=0)
+    coins_earned = models.IntegerField(default=0)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_user_month'),
+        ]
+    def __str__(self):
+        return f"{self.user}, {self.month:%Y-%m}, {self.days_logged} days"
+
+class CoinTransaction(models.Model):
+    """
+    One signed change to a user's coins. Rows are only ever inserted: a
+    correction is another row, so the table is the full history of every
+    balance (see user_app/ledger.py).
+    """
+    GRANT = 'grant'
+    EARN = 'earn'
+    PENALTY = 'penalty'
+    SPEND = 'spend'
+    REVERSAL = 'reversal'
+    KINDS = [(GRANT, 'Grant'), (EARN, 'Earn'), (PENALTY, 'Penalty'), (SPEND, 'Spend'), (REVERSAL, 'Reversal')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    amount = models.IntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    note = models.CharField(max_length=100, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='coin_ledger_user_idx'),
+        ]
+    def __str__(self):
+        return f"{self.user}, {self.amount:+d} ({self.kind})"
+
+class CoinSnapshot(models.Model):
+    """
+    A user's balance including every CoinTransaction up to ledger_id, so the
+    live balance only has to add the transactions after it.
+    """
+    user = models.OneToOneField(User, primary_key=True, on_delete=models.CASCADE)
+    balance = models.IntegerField()
+    ledger_id = models.BigIntegerField(db_index=True)
+    taken = models.DateTimeField(auto_now=True)
     def __str__(self):
-        return f"{self.user}, {self.streak} days, {self.coins} coins"
\ No newline at end of file
+        return f"{self.user}, {self.balance} coins at #{self.ledger_id}"
@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class DayCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a user's Day rows, newest first.
+
+    (user, day) is unique, so the opaque ?cursor= token maps straight onto a
+    `day < x` range scan and the cost of a page does not depend on how much
+    history the user has.
+    """
+    ordering = '-day'
+    page_size = settings.CALENDAR_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.CALENDAR_MAX_PAGE_SIZE
+
+
+class LeaderboardPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,82 @@
+"""
+Per-user monthly rollups of the Day history (MonthlyRollup rows).
+
+The streak engine calls record() inside its locked transaction with every
+check-in it applies, so the rollups move in step with Day, Profile and
+StreakBadge. backfill_rollups rebuilds them from the full history.
+"""
+from .models import *
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def add_checkin(row, previous_activity, activity, coins_earned, streak):
+    counts = row.activity_counts
+    if previous_activity is None:
+        row.days_logged += 1
+    else:  # the day was logged before; move it to its new activity value
+        key = str(previous_activity)
+        counts[key] = counts.get(key, 0) - 1
+        if counts[key] <= 0:
+            del counts[key]
+    counts[str(activity)] = counts.get(str(activity), 0) + 1
+    row.coins_earned += coins_earned
+    row.longest_streak = max(row.longest_streak, streak)
+
+
+def save(rows):
+    MonthlyRollup.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'month'],
+        update_fields=['days_logged', 'activity_counts', 'longest_streak', 'coins_earned']
+    )
+
+
+def record(user, changes):
+    """
+    Fold check-ins into the user's rollups. `changes` is a list of
+    (day, previous_activity, activity, coins_earned, streak_after) tuples in
+    the order they were applied; previous_activity is None for a new day.
+    The caller must hold the user's Profile lock.
+    """
+    months = {month_of(day) for day, *_ in changes}
+    rows = {row.month: row for row in MonthlyRollup.objects.filter(user=user, month__in=months)}
+    for day, previous_activity, activity, coins_earned, streak in changes:
+        month = month_of(day)
+        if month not in rows:
+            rows[month] = MonthlyRollup(user=user, month=month, activity_counts={})
+        add_checkin(rows[month], previous_activity, activity, coins_earned, streak)
+    save(list(rows.values()))
+
+
+def summarize(rows, passed):
+    """
+    Month-by-month and all-time totals from rollup dicts (as returned by
+    .values()). `passed` is the activity value counted as a success.
+    """
+    months, counts = [], {}
+    total = {'days_logged': 0, 'longest_streak': 0, 'coins_earned': 0}
+    for row in rows:
+        months.append({
+            'month': row['month'].strftime('%Y-%m'),
+            'days_logged': row['days_logged'],
+            'activity_counts': row['activity_counts'],
+            'success_rate': _rate(row['activity_counts'], row['days_logged'], passed),
+            'longest_streak': row['longest_streak'],
+            'coins_earned': row['coins_earned'],
+        })
+        total['days_logged'] += row['days_logged']
+        total['coins_earned'] += row['coins_earned']
+        total['longest_streak'] = max(total['longest_streak'], row['longest_streak'])
+        for activity, count in row['activity_counts'].items():
+            counts[activity] = counts.get(activity, 0) + count
+    total['activity_counts'] = counts
+    total['success_rate'] = _rate(counts, total['days_logged'], passed)
+    return months, total
+
+
+def _rate(counts, days_logged, passed):
+    return round(counts.get(str(passed), 0) / days_logged, 4) if days_logged else None
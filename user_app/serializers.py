@@ -18,6 +18,15 @@ class DayLogSerializer(serializers.ModelSerializer):
 
 class ProfileSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
+    # The live ledger balance, annotated by the view; Profile.coins only moves with snapshots
+    coins = serializers.IntegerField(source='balance', read_only=True)
     class Meta:
         model = Profile
-        fields = ('__all__')
\ No newline at end of file
+        fields = ('__all__')
+
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    user = serializers.CharField(source='username', read_only=True)
+    class Meta:
+        model = LeaderboardEntry
+        fields = ('user', 'streak', 'coins')
@@ -0,0 +1,300 @@
+from django.db import transaction
+from django.db.models import F
+from .models import *
+from . import leaderboard, ledger, rollups
+from .dashboard import invalidate_dashboards
+from rewards_app.models import StreakBadge
+# Extra
+from datetime import date, datetime, timedelta
+
+# Activity values posted by the dashboard form
+FAILED = 1
+PASSED = 5
+
+DAILY_COINS = 50
+FAILURE_PENALTY = 10
+
+DEFAULT_BADGE = ('#ffffff', 1)
+
+# Weeks needed for each badge, highest first (see rewards_app/models.py)
+BADGE_LADDER = [
+    (52, 'orange', 2.5),
+    (39, 'purple', 2),
+    (26, 'blue', 1.75),
+    (13, 'green', 1.5),
+    (4, 'yellow', 1.25),
+    (1, 'grey', 1.125),
+]
+
+
+def badge_for_weeks(weeks):
+    """Return the (color, multiplyer) pair earned after `weeks` full weeks"""
+    for min_weeks, color, multiplyer in BADGE_LADDER:
+        if weeks >= min_weeks:
+            return color, multiplyer
+    return DEFAULT_BADGE
+
+
+def _locked_profile_and_badge(user):
+    """
+    Fetch (or create) the user's Profile and StreakBadge with row locks held.
+    The Profile comes with the live coin balance as `balance`.
+    """
+    profile, created = Profile.objects.select_for_update().annotate(balance=ledger.live_balance()).get_or_create(
+        user=user,
+        defaults={'coins': ledger.STARTING_COINS, 'streak': 0}
+    )
+    if created:
+        ledger.post(user.id, ledger.STARTING_COINS, CoinTransaction.GRANT, 'starting coins')
+        profile.balance = ledger.STARTING_COINS
+    badge = StreakBadge.objects.select_for_update().filter(user=user).order_by('pk').first()
+    if badge is None:
+        badge = StreakBadge.objects.create(user=user, weeks=0, color=DEFAULT_BADGE[0], multiplyer=DEFAULT_BADGE[1])
+    return profile, badge
+
+
+def _upsert_days(user, entries):
+    Day.objects.bulk_create(
+        [Day(user=user, day=day, activity=activity, notes=notes) for day, activity, notes in entries],
+        update_conflicts=True,
+        unique_fields=['user', 'day'],
+        update_fields=['activity', 'notes']
+    )
+
+
+def _state(profile, badge):
+    last_updated = profile.last_updated
+    if isinstance(last_updated, datetime):  # fresh Profile, default not yet round-tripped
+        last_updated = last_updated.date()
+    return {
+        'streak': profile.streak,
+        'coins': profile.balance,
+        'last_updated': last_updated,
+        'weeks': badge.weeks,
+        'color': badge.color,
+        'multiplyer': badge.multiplyer,
+    }
+
+
+def initial_state(date_joined):
+    """
+    Streak state to replay a user's history from. A new Profile starts with
+    last_updated set to the signup date. Coins only matter for the failure
+    penalty floor, which never affects streaks or badges, so a large balance
+    keeps a replay from clamping.
+    """
+    return {
+        'streak': 0,
+        'coins': 10 ** 9,
+        'last_updated': date_joined.date(),
+        'weeks': 0,
+        'color': DEFAULT_BADGE[0],
+        'multiplyer': DEFAULT_BADGE[1],
+    }
+
+
+def apply_checkin(state, day, activity, has_other_days):
+    """
+    Apply one check-in's streak, coin and badge rules to `state` in place and
+    return the coins earned. `has_other_days` is a callable, only consulted
+    when a missed day has to be told apart from a first-ever check-in.
+    """
+    missed_day = state['last_updated'] != day - timedelta(days=1)
+
+    # Handle failure or missed day
+    if activity == FAILED or (missed_day and has_other_days()):
+        if activity == FAILED:  # Only deduct coins for actual failure
+            state['coins'] -= min(state['coins'], FAILURE_PENALTY)
+        state['streak'] = 0
+        state['weeks'] = 0
+        state['color'], state['multiplyer'] = DEFAULT_BADGE
+        state['last_updated'] = day
+        return 0
+
+    # Handle success
+    if activity == PASSED:
+        coins_earned = int(DAILY_COINS * state['multiplyer'])
+        state['streak'] += 1
+        state['coins'] += coins_earned
+        state['last_updated'] = day
+
+        # Update streak badge
+        if state['streak'] % 7 == 0:
+            state['weeks'] += 1
+            state['color'], state['multiplyer'] = badge_for_weeks(state['weeks'])
+        return coins_earned
+
+    return 0
+
+
+def _save_state(profile, badge, before, after):
+    """Write the changed fields back, applying counters as F() deltas; coins go to the ledger"""
+    if any(before[field] != after[field] for field in ('streak', 'last_updated')):
+        Profile.objects.filter(pk=profile.pk).update(
+            streak=F('streak') + (after['streak'] - before['streak']),
+            last_updated=after['last_updated']
+        )
+    if any(before[field] != after[field] for field in ('weeks', 'color', 'multiplyer')):
+        StreakBadge.objects.filter(pk=badge.pk).update(
+            weeks=F('weeks') + (after['weeks'] - before['weeks']),
+            color=after['color'],
+            multiplyer=after['multiplyer']
+        )
+
+
+def _coin_entry(day, coins_before, coins_after):
+    """The ledger (amount, kind, note) for one check-in's change in coins"""
+    amount = coins_after - coins_before
+    return amount, CoinTransaction.EARN if amount > 0 else CoinTransaction.PENALTY, f'check-in {day}'
+
+
+def _result(day, activity, notes, coins_earned, state, weeks_before):
+    return {
+        'day': str(day),
+        'activity': activity,
+        'notes': notes,
+        'coins_earned': coins_earned,
+        'current_coins': state['coins'],
+        'current_streak': state['streak'],
+        'multiplier': state['multiplyer'],
+        'badge_upgraded': state['weeks'] > weeks_before and badge_for_weeks(state['weeks']) != badge_for_weeks(weeks_before),
+    }
+
+
+def log_day(user, activity, notes='', today=None):
+    """
+    Record today's check-in and apply the streak, coin and badge rules.
+
+    Everything runs in one transaction with the Profile and StreakBadge rows
+    locked, so concurrent submissions for the same user are serialised; the
+    coins earned or lost are appended to the ledger. The query count does not
+    depend on how many days the user has logged.
+    """
+    today = today or date.today()
+
+    with transaction.atomic():
+        profile, badge = _locked_profile_and_badge(user)
+        previous_activity = Day.objects.filter(user=user, day=today).values_list('activity', flat=True).first()
+        _upsert_days(user, [(today, activity, notes)])
+
+        state = _state(profile, badge)
+        before = dict(state)
+        coins_earned = apply_checkin(
+            state, today, activity,
+            lambda: Day.objects.filter(user=user).exclude(day=today).exists()
+        )
+        _save_state(profile, badge, before, state)
+        if state['coins'] != before['coins']:
+            ledger.post(user.id, *_coin_entry(today, before['coins'], state['coins']))
+        rollups.record(user, [(today, previous_activity, activity, coins_earned, state['streak'])])
+
+    return _result(today, activity, notes, coins_earned, state, before['weeks'])
+
+
+def log_days(user, entries):
+    """
+    Record a batch of (day, activity, notes) check-ins, e.g. replayed by an
+    offline client, and return one result per entry.
+
+    Entries are applied in day order (stable for repeats of the same day) and
+    the outcome matches calling log_day() for each of them in that order, but
+    the Day rows are written with one upsert and Profile/StreakBadge are
+    updated once from the merged history.
+
+    Entries dated on or before the last check-in already applied to the
+    Profile are skipped, and their results say so with `skipped`: replaying
+    them would count as a missed day and reset the streak.
+    """
+    entries = sorted(entries, key=lambda entry: entry[0])
+    batch_days = {day for day, activity, notes in entries}
+
+    with transaction.atomic():
+        profile, badge = _locked_profile_and_badge(user)
+
+        # History the replay can see: days already stored inside the batch's
+        # range, and whether anything is stored outside it
+        history = Day.objects.filter(user=user)
+        stored_activity = dict(history.filter(day__in=batch_days).values_list('day', 'activity'))
+        logged_days = set(stored_activity)
+        logged_elsewhere = history.exclude(day__in=batch_days).exists()
+
+        state = _state(profile, badge)
+        before = dict(state)
+        # A new Profile's last_updated is the signup date, not a check-in
+        last_checkin = state['last_updated']
+        stale_days = {
+            day for day in batch_days
+            if day < last_checkin or (day == last_checkin and day in stored_activity)
+        }
+
+        # One row per day; the last entry for a day wins, as on replay
+        _upsert_days(user, list({
+            day: (day, activity, notes) for day, activity, notes in entries if day not in stale_days
+        }.values()))
+
+        results, changes, coin_entries = [], [], []
+        for day, activity, notes in entries:
+            if day in stale_days:
+                results.append(dict(_result(day, activity, notes, 0, state, state['weeks']), skipped=True))
+                continue
+            logged_days.add(day)
+            weeks_before, coins_before = state['weeks'], state['coins']
+            coins_earned = apply_checkin(
+                state, day, activity,
+                lambda: logged_elsewhere or len(logged_days) > 1
+            )
+            results.append(dict(_result(day, activity, notes, coins_earned, state, weeks_before), skipped=False))
+            changes.append((day, stored_activity.get(day), activity, coins_earned, state['streak']))
+            stored_activity[day] = activity
+            if state['coins'] != coins_before:
+                coin_entries.append(_coin_entry(day, coins_before, state['coins']))
+        _save_state(profile, badge, before, state)
+        if coin_entries:
+            ledger.post_many(user.id, coin_entries)
+        rollups.record(user, changes)
+
+    return results
+
+
+def expire_state(state, today):
+    """
+    Apply the nightly expiry to a replayed `state` in place: a streak whose
+    last check-in is older than yesterday is reset, as expire_streaks() does.
+    """
+    if state['streak'] > 0 and state['last_updated'] < today - timedelta(days=1):
+        state['streak'] = 0
+        state['weeks'] = 0
+        state['color'], state['multiplyer'] = DEFAULT_BADGE
+
+
+def expire_streaks(today=None, batch_size=10000):
+    """
+    Reset the streak and badge of everyone whose last check-in is older than
+    yesterday, the same reset their next check-in would apply, so stats and
+    leaderboards stop showing lapsed streaks. Returns how many were reset.
+
+    Works in batches of set-based UPDATEs over the partial index on
+    Profile.last_updated: each batch takes the next `batch_size` lapsed
+    profiles and resets their Profile and StreakBadge rows in that order (the
+    check-in lock order) in one transaction, then their leaderboard entries
+    and cached dashboard stats, as the check-in views do. A reset profile
+    leaves the selection, so no cursor is needed and a rerun is a no-op.
+    Days replayed later for dates before the run continue from the reset
+    streak.
+    """
+    # Same rule as expire_state(), as one UPDATE per batch
+    yesterday = (today or date.today()) - timedelta(days=1)
+    lapsed = Profile.objects.filter(last_updated__lt=yesterday, streak__gt=0)
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(lapsed.values_list('pk', 'user_id')[:batch_size])
+            if not batch:
+                return expired
+            user_ids = [user_id for pk, user_id in batch if user_id is not None]
+            expired += lapsed.filter(pk__in=[pk for pk, user_id in batch]).update(streak=0)
+            StreakBadge.objects.filter(user_id__in=user_ids).exclude(
+                weeks=0, color=DEFAULT_BADGE[0], multiplyer=DEFAULT_BADGE[1]
+            ).update(weeks=0, color=DEFAULT_BADGE[0], multiplyer=DEFAULT_BADGE[1])
+        leaderboard.reset_streaks(user_ids)
+        invalidate_dashboards(user_ids)
@@ -0,0 +1,55 @@
+"""Background tasks for user_app, run by `manage.py worker` (see tasks_app)"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage
+from rewards_app.models import StreakBadge
+from tasks_app.registry import daily, register
+from tasks_app.tasks import send_messages
+from .ledger import snapshot_balances
+from .streaks import expire_streaks
+
+
+@register('badge_upgrade', batch=True)
+def notify_badge_upgrades(payloads):
+    """Email each user the badge they hold now; users without an email are skipped"""
+    user_ids = {payload['user_id'] for payload in payloads}
+    users = {user.id: user for user in User.objects.filter(id__in=user_ids).only('email', 'first_name', 'username')}
+    badges = {}
+    for badge in StreakBadge.objects.filter(user_id__in=user_ids).order_by('-pk'):
+        badges[badge.user_id] = badge  # the lowest pk wins, as in the streak engine
+
+    messages, positions, errors = [], [], [None] * len(payloads)
+    for index, payload in enumerate(payloads):
+        user, badge = users.get(payload['user_id']), badges.get(payload['user_id'])
+        if user is None or badge is None or not user.email:
+            continue
+        messages.append(EmailMessage(
+            f"You earned the {badge.color} badge!",
+            f"Hi {user.first_name or user.username},\n\n"
+            f"{badge.weeks} weeks strong! Your {badge.color} badge multiplies every daily reward "
+            f"by {badge.multiplyer}. Keep it going.\n\nThe Habify team",
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+        ))
+        positions.append(index)
+    for index, error in zip(positions, send_messages(messages)):
+        errors[index] = error
+    return errors
+
+
+@register('expire_streaks')
+def run_expire_streaks(payload):
+    expire_streaks()
+
+
+if settings.STREAK_EXPIRY_AT:
+    daily('expire_streaks', settings.STREAK_EXPIRY_AT)
+
+
+@register('snapshot_coins')
+def run_snapshot_balances(payload):
+    snapshot_balances()
+
+
+if settings.COIN_SNAPSHOT_AT:
+    daily('snapshot_coins', settings.COIN_SNAPSHOT_AT)
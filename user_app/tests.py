@@ -1,3 +1,563 @@
-from django.test import TestCase
+import csv
+import json
+import os
+from unittest import mock, skipUnless
+from io import StringIO
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.urls import path
+from django.test import AsyncClient, Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from .benchmark import BENCH_PASSWORD, SCENARIOS, count_queries, logged_in_clients, seed_users
+from .models import *
+from . import async_views, leaderboard, ledger
+from .streaks import log_day, log_days
+from .management.commands.recompute_streaks import Command
+from rewards_app.models import StreakBadge
 
-# Create your tests here.
+
+class QueryCountTests(TestCase):
+    """Endpoint query counts must not grow with a user's Day history"""
+
+    def setUp(self):
+        for alias in ('default', 'dashboard', 'throttle'):
+            caches[alias].clear()
+        self.shallow = logged_in_clients(seed_users(1, 3, prefix='shallow'))[0]
+        self.deep = logged_in_clients(seed_users(1, 400, prefix='deep'))[0]
+
+    def count_queries(self, scenario, pair):
+        request, budget = SCENARIOS[scenario]
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*pair)
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertLessEqual(count_queries(queries), budget)
+        return count_queries(queries)
+
+    def assertFlat(self, scenario):
+        self.assertEqual(self.count_queries(scenario, self.shallow), self.count_queries(scenario, self.deep))
+
+    def test_checkin(self):
+        self.assertFlat('checkin')
+
+    def test_submissions(self):
+        self.assertFlat('submissions')
+
+    def test_daylog(self):
+        self.assertFlat('daylog')
+
+    def test_login(self):
+        self.assertFlat('login')
+
+
+class StreakEngineTests(TestCase):
+
+    def setUp(self):
+        self.user = seed_users(1, 0, prefix='streak')[0]
+        self.start = date.today() - timedelta(days=30)
+
+    def test_week_of_passes_earns_grey_badge(self):
+        for offset in range(7):
+            result = log_day(self.user, 5, '', today=self.start + timedelta(days=offset))
+        self.assertEqual(result['current_streak'], 7)
+        self.assertEqual(result['multiplier'], 1.125)
+        badge = StreakBadge.objects.get(user=self.user)
+        self.assertEqual((badge.weeks, badge.color), (1, 'grey'))
+
+    def test_missed_day_resets_streak(self):
+        log_day(self.user, 5, '', today=self.start)
+        result = log_day(self.user, 5, '', today=self.start + timedelta(days=2))
+        self.assertEqual(result['current_streak'], 0)
+
+    def test_resubmitting_a_day_keeps_one_row(self):
+        log_day(self.user, 5, 'first', today=self.start)
+        log_day(self.user, 3, 'second', today=self.start)
+        self.assertEqual(list(Day.objects.filter(user=self.user).values_list('notes', flat=True)), ['second'])
+
+    def test_batch_matches_logging_each_day_in_turn(self):
+        entries = [(self.start + timedelta(days=offset), 5, '') for offset in (0, 1, 2, 3, 4, 5, 6, 8, 9)]
+        entries += [(self.start + timedelta(days=10), 1, 'missed'), (self.start + timedelta(days=11), 5, '')]
+        one_by_one, batched = seed_users(1, 0, prefix='sequential')[0], seed_users(1, 0, prefix='batched')[0]
+        Profile.objects.filter(user__in=[one_by_one, batched]).update(last_updated=self.start - timedelta(days=1))
+
+        expected = [log_day(one_by_one, activity, notes, today=day) for day, activity, notes in entries]
+        results = log_days(batched, entries)
+        self.assertEqual([{k: v for k, v in result.items() if k != 'skipped'} for result in results], expected)
+
+        def outcome(user):
+            profile = Profile.objects.get(user=user)
+            badge = StreakBadge.objects.get(user=user)
+            return profile.streak, profile.last_updated, ledger.load_balance(user.id), badge.weeks, badge.color
+        self.assertEqual(outcome(batched), outcome(one_by_one))
+
+    def test_batch_skips_days_already_checked_in(self):
+        log_day(self.user, 5, '', today=self.start)
+        log_day(self.user, 5, '', today=self.start + timedelta(days=1))
+        results = log_days(self.user, [
+            (self.start - timedelta(days=3), 1, 'late'),
+            (self.start + timedelta(days=1), 1, 'again'),
+            (self.start + timedelta(days=2), 5, ''),
+        ])
+        self.assertEqual([result['skipped'] for result in results], [True, True, False])
+        self.assertEqual(results[-1]['current_streak'], 3)
+        self.assertFalse(Day.objects.filter(user=self.user, notes__in=['late', 'again']).exists())
+
+
+class StreakExpiryTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.users = seed_users(3, 14, prefix='expiry')
+        StreakBadge.objects.update(weeks=2, color='grey', multiplyer=1.125)
+        self.lapsed = self.users[0]
+        Profile.objects.filter(user=self.lapsed).update(last_updated=date.today() - timedelta(days=2))
+
+    def test_only_lapsed_streaks_are_reset(self):
+        call_command('expire_streaks', batch_size=1, stdout=open(os.devnull, 'w'))
+        streaks = dict(Profile.objects.values_list('user__username', 'streak'))
+        self.assertEqual(streaks, {'expiry0': 0, 'expiry1': 14, 'expiry2': 14})
+        badge = StreakBadge.objects.get(user=self.lapsed)
+        self.assertEqual((badge.weeks, badge.color, badge.multiplyer), (0, '#ffffff', 1))
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.lapsed).streak, 0)
+        self.assertEqual(StreakBadge.objects.filter(weeks=2).count(), 2)
+
+    def test_next_checkin_matches_the_lazy_reset(self):
+        self.client.force_login(self.lapsed)
+        self.assertEqual(self.client.get('/api/stats/').json()['profile']['streak'], 14)  # cached
+        call_command('expire_streaks', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.client.get('/api/stats/').json()['profile']['streak'], 0)
+        result = log_day(self.lapsed, 5)
+        self.assertEqual((result['current_streak'], result['coins_earned']), (0, 0))
+
+    def test_recompute_keeps_expired_streaks(self):
+        Day.objects.filter(user=self.lapsed, day=date.today() - timedelta(days=1)).delete()
+        call_command('expire_streaks', stdout=open(os.devnull, 'w'))
+        out = StringIO()
+        call_command('recompute_streaks', dry_run=True, stdout=out)
+        self.assertIn('would change 0', out.getvalue())
+        call_command('recompute_streaks', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Profile.objects.get(user=self.lapsed).streak, 0)
+        self.assertEqual(StreakBadge.objects.get(user=self.lapsed).weeks, 0)
+
+
+class RecomputeStreaksTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.users = seed_users(2, 14, prefix='recompute')
+        StreakBadge.objects.update(weeks=2, color='grey', multiplyer=1.125)  # what 14 passed days earn
+        self.drifted = self.users[0]
+        Profile.objects.filter(user=self.drifted).update(streak=99)
+        StreakBadge.objects.filter(user=self.drifted).update(weeks=7, color='yellow', multiplyer=1.25)
+        LeaderboardEntry.objects.filter(user=self.drifted).update(streak=99)
+
+    def recompute(self, **options):
+        out = StringIO()
+        call_command('recompute_streaks', stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_reports_drift_without_writing(self):
+        out = self.recompute(dry_run=True)
+        self.assertIn('recompute0: streak 99 -> 14, weeks 7 -> 2, color yellow -> grey, multiplyer 1.25 -> 1.125', out)
+        self.assertNotIn('recompute1', out)
+        self.assertIn('Checked 2 users, would change 1', out)
+        self.assertEqual(Profile.objects.get(user=self.drifted).streak, 99)
+        self.assertEqual(StreakBadge.objects.get(user=self.drifted).weeks, 7)
+
+    def test_drift_is_repaired(self):
+        self.client.force_login(self.drifted)
+        self.assertEqual(self.client.get('/api/stats/').json()['profile']['streak'], 99)  # now cached
+        self.assertIn('Checked 2 users, updated 1', self.recompute(batch_size=1, chunk_size=5))
+        self.assertEqual(Profile.objects.get(user=self.drifted).streak, 14)
+        badge = StreakBadge.objects.get(user=self.drifted)
+        self.assertEqual((badge.weeks, badge.color, badge.multiplyer), (2, 'grey', 1.125))
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.drifted).streak, 14)
+        self.assertEqual(self.client.get('/api/stats/').json()['profile']['streak'], 14)
+        self.assertIn('would change 0', self.recompute(dry_run=True))
+
+    def test_profile_without_days_is_reset(self):
+        idle = seed_users(1, 0, prefix='idle')[0]
+        Profile.objects.filter(user=idle).update(streak=30)
+        StreakBadge.objects.filter(user=idle).update(weeks=4, color='yellow', multiplyer=1.25)
+        self.assertIn('idle0: streak 30 -> 0', self.recompute(user='idle0', dry_run=True))
+        self.recompute(user='idle0')
+        profile, badge = Profile.objects.get(user=idle), StreakBadge.objects.get(user=idle)
+        self.assertEqual((profile.streak, badge.weeks, badge.multiplyer), (0, 0, 1))
+
+    def test_checkin_between_compare_and_write_is_kept(self):
+        rows_for = Command.rows_for
+
+        def checkin_first(command, user_ids, lock=False):
+            if lock:  # lands after the unlocked comparison, before the rows are locked
+                log_day(self.drifted, 5)
+            return rows_for(command, user_ids, lock)
+
+        with mock.patch.object(Command, 'rows_for', checkin_first):
+            self.recompute()
+        profile = Profile.objects.get(user=self.drifted)
+        self.assertEqual((profile.streak, profile.last_updated), (15, date.today()))
+
+    def test_replay_applies_misses_and_failures(self):
+        yesterday = date.today() - timedelta(days=1)
+        Day.objects.filter(user=self.users[1], day=yesterday - timedelta(days=10)).delete()
+        Day.objects.filter(user=self.users[1], day=yesterday - timedelta(days=2)).update(activity=1)
+        out = self.recompute(user='recompute1', dry_run=True)
+        self.assertIn('recompute1: streak 14 -> 2, weeks 2 -> 0, color grey -> #ffffff, multiplyer 1.125 -> 1', out)
+        self.assertIn('Checked 1 users, would change 1', out)
+
+
+class SignupTests(TestCase):
+
+    def signup(self, username, email):
+        return self.client.post('/api/new/', {
+            'username': username, 'email': email, 'password': 'pw-123-secret',
+            'first_name': 'A', 'last_name': 'B',
+        }, content_type='application/json')
+
+    def test_signup_logs_in_with_profile_and_badge(self):
+        response = self.signup('newbie', 'newbie@example.com')
+        self.assertEqual(response.status_code, 200, response.content)
+        user = User.objects.get(username='newbie')
+        self.assertEqual(Profile.objects.get(user=user).coins, 100)
+        self.assertTrue(StreakBadge.objects.filter(user=user).exists())
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.id)
+
+    def test_conflicting_field_is_reported(self):
+        self.signup('newbie', 'newbie@example.com')
+        self.assertEqual(self.signup('newbie', 'other@example.com').json()['error'], 'Username already exists')
+        self.assertEqual(self.signup('other', 'newbie@example.com').json()['error'], 'Email address already exists')
+
+
+class SessionEngineTests(TestCase):
+
+    def setUp(self):
+        self.users = seed_users(1, 3)
+
+    def submissions_queries(self, engine):
+        with override_settings(SESSION_ENGINE=engine):
+            pair = logged_in_clients(self.users)[0]
+            SCENARIOS['submissions'][0](*pair)  # warm the session cache
+            with CaptureQueriesContext(connection) as queries:
+                SCENARIOS['submissions'][0](*pair)
+        return len(queries)
+
+    def test_cached_engines_skip_the_session_query(self):
+        from_db = self.submissions_queries('django.contrib.sessions.backends.db')
+        self.assertLess(self.submissions_queries('django.contrib.sessions.backends.cached_db'), from_db)
+        self.assertLess(self.submissions_queries('django.contrib.sessions.backends.signed_cookies'), from_db)
+
+    def test_prune_sessions_keeps_live_ones(self):
+        logged_in_clients(self.users)
+        Session.objects.create(session_key='expired', session_data='', expire_date=timezone.now() - timedelta(days=1))
+        call_command('prune_sessions', batch_size=1, verbosity=0)
+        self.assertFalse(Session.objects.filter(session_key='expired').exists())
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class MonthlyRollupTests(TestCase):
+
+    def setUp(self):
+        self.client, self.user = logged_in_clients(seed_users(1, 0, prefix='rollup'))[0]
+        Profile.objects.filter(user=self.user).update(last_updated=date(2024, 1, 29))
+        log_days(self.user, [(date(2024, 1, 30), 5, ''), (date(2024, 1, 31), 5, ''), (date(2024, 2, 1), 1, '')])
+        log_day(self.user, 5, today=date(2024, 2, 1))  # re-logging a day moves its count
+
+    def test_rollups_follow_checkins(self):
+        months = MonthlyRollup.objects.filter(user=self.user).order_by('month')
+        self.assertEqual([(m.days_logged, m.activity_counts) for m in months], [(2, {'5': 2}), (1, {'5': 1})])
+        self.assertEqual(months[0].longest_streak, 2)
+
+    def test_backfill_rebuilds_the_same_counts(self):
+        expected = list(MonthlyRollup.objects.order_by('month').values_list('month', 'days_logged', 'activity_counts'))
+        MonthlyRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(MonthlyRollup.objects.order_by('month').values_list('month', 'days_logged', 'activity_counts')), expected)
+
+    def test_stats_endpoint_reads_rollups_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/stats/monthly/?from=2024-01')
+        self.assertFalse([q for q in queries if 'user_app_day' in q['sql']])
+        body = response.json()
+        self.assertEqual([m['month'] for m in body['months']], ['2024-01', '2024-02'])
+        self.assertEqual(body['total']['days_logged'], 3)
+        self.assertEqual(body['total']['success_rate'], 1.0)
+        self.assertEqual(self.client.get('/api/stats/monthly/?to=2024-13').status_code, 400)
+
+
+@override_settings(COIN_SNAPSHOT_LAG_SECONDS=0)
+class CoinLedgerTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.client, self.user = logged_in_clients(seed_users(1, 0, prefix='ledger', coins=5))[0]
+
+    def test_checkins_and_spends_are_appended(self):
+        log_day(self.user, 1, today=date.today() - timedelta(days=1))  # the penalty stops at zero
+        self.assertIsNone(ledger.debit(self.user.id, 5, CoinTransaction.SPEND))
+        log_day(self.user, 5)
+        self.assertEqual(ledger.debit(self.user.id, 30, CoinTransaction.SPEND), 20)
+        self.assertEqual(
+            list(CoinTransaction.objects.filter(user=self.user).order_by('id').values_list('amount', 'kind')),
+            [(5, 'grant'), (-5, 'penalty'), (-5, 'spend'), (5, 'reversal'), (50, 'earn'), (-30, 'spend')]
+        )
+
+    def test_debit_is_checked_after_a_racing_penalty(self):
+        post = ledger.post
+
+        def penalty_after_spend(user_id, amount, kind, note=''):
+            row = post(user_id, amount, kind, note)
+            if kind == CoinTransaction.SPEND:
+                # A failed check-in that read the balance before the spend
+                post(user_id, -5, CoinTransaction.PENALTY, 'check-in')
+            return row
+
+        with mock.patch('user_app.ledger.post', penalty_after_spend):
+            self.assertIsNone(ledger.debit(self.user.id, 5, CoinTransaction.SPEND))
+        self.assertEqual(ledger.load_balance(self.user.id), 0)
+
+    def test_balance_is_snapshot_plus_tail(self):
+        ledger.post(self.user.id, 50, CoinTransaction.EARN)
+        self.assertEqual(ledger.snapshot_balances(), 1)
+        self.assertEqual(CoinSnapshot.objects.get(user=self.user).balance, 55)
+        self.assertEqual(Profile.objects.get(user=self.user).coins, 55)
+        ledger.post(self.user.id, 5, CoinTransaction.EARN)
+        self.assertEqual(ledger.load_balance(self.user.id), 60)
+        self.assertEqual(ledger.snapshot_balances(), 1)
+        self.assertEqual(ledger.snapshot_balances(), 0)
+
+    def test_balance_endpoint_is_cached_until_the_next_transaction(self):
+        self.assertEqual(self.client.get('/api/coins/').json()['coins'], 5)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/coins/')
+        self.assertEqual(len(queries), 2)  # session and user only
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.post(self.user.id, 50, CoinTransaction.EARN)
+        self.assertEqual(self.client.get('/api/coins/').json()['coins'], 55)
+
+    def test_profile_endpoint_reports_the_live_balance(self):
+        ledger.post(self.user.id, 50, CoinTransaction.EARN)  # not yet in a snapshot or Profile.coins
+        self.assertEqual(Profile.objects.get(user=self.user).coins, 5)
+        self.assertEqual(self.client.get('/api/profile/').json()[0]['coins'], 55)
+
+    def test_reconcile_finds_and_fixes_drift(self):
+        ledger.snapshot_balances()
+        CoinSnapshot.objects.filter(user=self.user).update(balance=999)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_coins', stdout=open(os.devnull, 'w'))
+        call_command('reconcile_coins', fix=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(CoinSnapshot.objects.get(user=self.user).balance, 5)
+        self.assertEqual(ledger.load_balance(self.user.id), 5)
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        users = seed_users(5, 0, prefix='board')
+        self.client, self.user = logged_in_clients(users[:1])[0]
+        # (streak, coins) per user: board0 ties board2 on streak, board4 ties board3 exactly
+        for user, (streak, coins) in zip(users, [(5, 10), (9, 0), (5, 30), (1, 0), (1, 0)]):
+            LeaderboardEntry.objects.filter(user=user).update(streak=streak, coins=coins)
+
+    def test_top_and_rank(self):
+        body = self.client.get('/api/leaderboard/?limit=3').json()
+        self.assertEqual([row['user'] for row in body['top']], ['board1', 'board2', 'board0'])
+        self.assertEqual(body['me']['rank'], 3)
+        body = self.client.get('/api/leaderboard/?board=coins&limit=2').json()
+        self.assertEqual([row['user'] for row in body['top']], ['board2', 'board0'])
+        self.assertEqual(body['me']['rank'], 2)
+        self.assertEqual(self.client.get('/api/leaderboard/?board=nope').status_code, 400)
+
+    def test_rank_below_the_cached_top_is_counted(self):
+        with mock.patch.object(leaderboard, 'CACHED_TOP', 2):
+            self.assertEqual(leaderboard.rank_of(self.user.id, 'streak')['rank'], 3)
+            board4 = User.objects.get(username='board4')
+            self.assertEqual(leaderboard.rank_of(board4.id, 'streak')['rank'], 4)  # tied with board3
+
+    @skipUnless(connection.vendor == 'sqlite', "checks SQLite's query plan")
+    def test_rank_count_reads_only_the_index(self):
+        with mock.patch.object(leaderboard, 'CACHED_TOP', 2), CaptureQueriesContext(connection) as queries:
+            leaderboard.rank_of(self.user.id, 'streak')
+        counts = [q['sql'] for q in queries if 'COUNT(*)' in q['sql']]
+        self.assertEqual(len(counts), 2)
+        with connection.cursor() as cursor:
+            for sql in counts:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                self.assertIn('USING COVERING INDEX leaderboard_streak_idx', cursor.fetchall()[-1][-1])
+
+    def test_profile_leaderboard_pages_through_entries(self):
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get('/api/profile/?leaderboard=1&page_size=2').json()
+        self.assertFalse([q for q in queries if 'user_app_profile' in q['sql']])
+        self.assertEqual(body['count'], 5)
+        self.assertEqual(body['results'], [
+            {'user': 'board1', 'streak': 9, 'coins': 0},
+            {'user': 'board2', 'streak': 5, 'coins': 30},
+        ])
+        body = self.client.get('/api/profile/?leaderboard=1&page_size=2&page=3').json()
+        self.assertEqual([row['user'] for row in body['results']], ['board4'])
+
+
+class BootstrapTests(TestCase):
+
+    def setUp(self):
+        for alias in ('dashboard', 'throttle'):
+            caches[alias].clear()
+
+    def test_fixed_query_count(self):
+        counts = []
+        for prefix, days in (('shallow', 3), ('deep', 400)):
+            client, user = logged_in_clients(seed_users(1, days, prefix=prefix))[0]
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get('/api/bootstrap/')
+            body = response.json()
+            self.assertEqual(body['user']['username'], user.username)
+            self.assertTrue(body['csrfToken'])
+            self.assertLessEqual(len(body['submissions']), 31)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0], 6)
+
+    def test_token_is_reusable_until_login(self):
+        client = Client(enforce_csrf_checks=True)
+        seed_users(1, 0, prefix='csrf')
+        token = client.get('/api/bootstrap/').json()['csrfToken']
+        login = client.post('/api/login/', {'username': 'csrf0', 'password': BENCH_PASSWORD},
+                            content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        token = login.json()['csrfToken']
+        for _ in range(2):
+            response = client.post('/api/daylog/', {'activity': 5}, content_type='application/json', HTTP_X_CSRFTOKEN=token)
+            self.assertEqual(response.status_code, 200, response.content)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.client, self.user = logged_in_clients(seed_users(1, 5, prefix='export'))[0]
+        self.days = [date.today() - timedelta(days=n) for n in range(5, 0, -1)]
+        Day.objects.filter(user=self.user, day=self.days[1]).update(activity=1, notes='late, "tired"')
+
+    def test_ndjson_streams_every_day_oldest_first(self):
+        response = self.client.get('/api/export/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="habify-export0-history.ndjson"')
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 2)  # sent in EXPORT_CHUNK_SIZE pieces
+        rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual([row['day'] for row in rows], [str(day) for day in self.days])
+        self.assertEqual(rows[1], {'day': str(self.days[1]), 'activity': 1, 'notes': 'late, "tired"'})
+
+    def test_csv_has_a_header_and_quotes_notes(self):
+        response = self.client.get(f'/api/export/?format=csv&from={self.days[1]}&to={self.days[2]}')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="habify-export0-history.csv"')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(list(csv.reader(StringIO(body))), [
+            ['day', 'activity', 'notes'],
+            [str(self.days[1]), '1', 'late, "tired"'],
+            [str(self.days[2]), '5', ''],
+        ])
+
+
+# The async routes user_app/urls.py mounts when ASYNC_API is on, for AsyncViewTests
+urlpatterns = [
+    path('api/log/', async_views.day_log_list),
+    path('api/submissions/', async_views.get_user_submissions),
+    path('api/stats/', async_views.get_user_stats),
+    path('api/coins/', async_views.get_coin_balance),
+    path('api/export/', async_views.export_history),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.user = seed_users(1, 5, prefix='async', coins=5)[0]
+        self.async_client.force_login(self.user)
+
+    async def test_submissions_are_paged_by_cursor(self):
+        body = (await self.async_client.get('/api/submissions/?page_size=3')).json()
+        yesterday = date.today() - timedelta(days=1)
+        self.assertEqual([row['day'] for row in body['submissions']], [str(yesterday - timedelta(days=n)) for n in range(3)])
+        self.assertEqual(body['submissions'][0]['user'], 'async0')
+        self.assertEqual(body['profile'], {'coins': 5, 'streak': 5, 'multiplier': 1})
+
+        body = (await self.async_client.get(body['next'] + '&compact=1')).json()
+        self.assertEqual(body['submissions'], [[str(yesterday - timedelta(days=n)), 5, ''] for n in (3, 4)])
+        self.assertEqual(body['fields'], ['day', 'activity', 'notes'])
+        self.assertIsNone(body['next'])
+        self.assertNotIn('profile', body)
+
+    async def test_day_log_and_balance(self):
+        body = (await self.async_client.get(f'/api/log/?from={date.today() - timedelta(days=2)}')).json()
+        self.assertEqual(len(body['results']), 2)
+        self.assertEqual((await self.async_client.get('/api/coins/')).json(), {'success': True, 'coins': 5})
+        self.assertEqual((await self.async_client.get('/api/stats/')).json()['profile']['streak'], 5)
+
+    async def test_export_streams(self):
+        response = await self.async_client.get('/api/export/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(body.splitlines()[0], 'day,activity,notes')
+        self.assertEqual(len(body.splitlines()), 6)
+
+    async def test_anonymous_requests(self):
+        client = AsyncClient()
+        for url in ('/api/submissions/', '/api/stats/', '/api/coins/', '/api/export/'):
+            self.assertEqual((await client.get(url)).status_code, 401, url)
+        self.assertEqual((await client.get('/api/log/')).json(), {'next': None, 'previous': None, 'results': []})
+
+    async def test_errors(self):
+        self.assertEqual((await self.async_client.post('/api/coins/')).status_code, 405)
+        self.assertEqual((await self.async_client.get('/api/submissions/?from=yesterday')).status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/submissions/?cursor=garbage')).status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/log/?cursor=garbage')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/export/?format=xml')).status_code, 400)
+
+
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        caches['throttle'].clear()
+        seed_users(1, 0, prefix='target')
+
+    def login(self, username, **extra):
+        return self.client.post('/api/login/', {'username': username, 'password': 'wrong'}, content_type='application/json', **extra)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'login_ip': '100/min', 'login_username': '3/min'}})
+    def test_username_bucket_rejects_before_any_query(self):
+        for _ in range(3):
+            self.assertEqual(self.login('target0').status_code, 401)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login('TARGET0 ')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.login('someone-else').status_code, 401)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'login_ip': '2/min', 'login_username': '100/min'}})
+    def test_ip_bucket_spans_usernames(self):
+        self.login('a')
+        self.login('b')
+        self.assertEqual(self.login('c').status_code, 429)
+        self.assertEqual(self.login('d', REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'login_ip': '2/min', 'login_username': '100/min'}})
+    def test_spoofed_forwarded_for_shares_the_bucket_without_proxies(self):
+        self.login('a', HTTP_X_FORWARDED_FOR='1.1.1.1')
+        self.login('b', HTTP_X_FORWARDED_FOR='2.2.2.2')
+        self.assertEqual(self.login('c', HTTP_X_FORWARDED_FOR='3.3.3.3').status_code, 429)
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1, 'DEFAULT_THROTTLE_RATES': {'login_ip': '1/min', 'login_username': '100/min'}})
+    def test_forwarded_for_identifies_the_client_behind_a_proxy(self):
+        self.login('a', HTTP_X_FORWARDED_FOR='1.1.1.1')
+        self.assertEqual(self.login('b', HTTP_X_FORWARDED_FOR='1.1.1.1').status_code, 429)
+        self.assertEqual(self.login('c', HTTP_X_FORWARDED_FOR='2.2.2.2').status_code, 401)
@@ -0,0 +1,134 @@
+"""
+Token-bucket throttles for the unauthenticated auth endpoints (login and
+password reset), plugged in as DRF throttle classes.
+
+Each bucket holds up to N tokens and refills at N per period, using the same
+"N/period" rates as DRF (REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']). A
+request takes one token or is rejected with 429 and Retry-After. Buckets
+live in the THROTTLE_CACHE_ALIAS cache: per-process local memory by default,
+shared by every worker when that alias points at Redis or Memcached (the
+read-modify-write is not atomic there, so a burst can slip a few requests
+past the limit, which is fine for shedding load).
+
+The views using these throttles have no DRF authentication classes, so a
+rejected request is turned away before any session, user or password work.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from config.metrics import registry as metrics
+
+# Per-process counters, read through throttle_stats()
+_counter_lock = threading.Lock()
+_counters = {}
+
+
+def _count(scope, result):
+    with _counter_lock:
+        counts = _counters.setdefault(scope, {'allowed': 0, 'throttled': 0})
+        counts[result] += 1
+    metrics.increment('habify_throttle_total', {'scope': scope, 'result': result})
+
+
+def parse_rate(rate):
+    """'20/min' -> (20, 60): bucket capacity and the seconds it takes to refill"""
+    count, period = rate.split('/')
+    return int(count), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+def throttle_stats():
+    with _counter_lock:
+        return {scope: dict(counts) for scope, counts in _counters.items()}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    One token bucket per `scope` and identity. Subclasses set `scope` and
+    implement get_identity(); a request without an identity is not limited
+    by that throttle.
+    """
+    scope = None
+    cache_lock = threading.Lock()  # serialises read-modify-write within a process
+
+    def __init__(self):
+        self.capacity, self.period = parse_rate(api_settings.DEFAULT_THROTTLE_RATES[self.scope])
+        self.retry_after = None
+
+    def get_identity(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+        identity = self.get_identity(request)
+        if not identity:
+            return True
+
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        key = f"throttle:{self.scope}:{identity}"
+        refill_per_second = self.capacity / self.period
+        with self.cache_lock:
+            now = time.time()
+            tokens, updated = cache.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.retry_after = (1 - tokens) / refill_per_second
+            # Kept until the bucket would be full again
+            cache.set(key, (tokens, now), int(self.period) + 1)
+
+        _count(self.scope, 'allowed' if allowed else 'throttled')
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPThrottle(TokenBucketThrottle):
+    """
+    Keyed by client IP. X-Forwarded-For is only trusted when NUM_PROXIES
+    says how many proxies added to it; otherwise DRF would key on the whole
+    client-supplied header and every spoofed value would get a fresh bucket.
+    """
+
+    def get_identity(self, request):
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+        return self.get_ident(request)
+
+
+class FieldThrottle(TokenBucketThrottle):
+    """Keyed by a request body field, e.g. the username being tried"""
+    field = None
+
+    def get_identity(self, request):
+        value = request.data.get(self.field)
+        return str(value).strip().lower() if value else None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginUsernameThrottle(FieldThrottle):
+    scope = 'login_username'
+    field = 'username'
+
+
+class PasswordResetIPThrottle(IPThrottle):
+    scope = 'password_reset_ip'
+
+
+class PasswordResetEmailThrottle(FieldThrottle):
+    scope = 'password_reset_email'
+    field = 'email'
+
+
+class PasswordResetAccountThrottle(FieldThrottle):
+    scope = 'password_reset_account'
+    field = 'uid'
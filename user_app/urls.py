@@ -1,17 +1,42 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from . import async_views
 app_name = 'user_app'
 
 urlpatterns = [
     # API endpoints (api/ prefix handled in main urls.py)
-    path('new/', views.CreateUser),
+    path('new/', views.CreateUser, name="create_user"),
     path('login/', views.login_user, name="login"),
     path('logout/', views.logout_user, name="logout"),
     path('forgot-password/', views.forgot_password, name="forgot_password"),
     path('reset-password/', views.reset_password, name="reset_password"),
-    path('csrf/', views.get_csrf),
+    path('csrf/', views.get_csrf, name="csrf"),
+    path('bootstrap/', views.bootstrap, name="bootstrap"),
     path('log/', views.DayLogView.as_view(), name="daylog"),
-    path('daylog/', views.NewDayLog),
+    path('daylog/', views.NewDayLog, name="new_daylog"),
+    path('daylog/batch/', views.NewDayLogBatch, name="daylog_batch"),
     path('submissions/', views.get_user_submissions, name="user_submissions"),
-    path('profile/', views.ProfileView.as_view())
-]
\ No newline at end of file
+    path('export/', views.export_history, name="export_history"),
+    path('stats/', views.get_user_stats, name="user_stats"),
+    path('stats/monthly/', views.get_monthly_stats, name="monthly_stats"),
+    path('stats/cache/', views.get_cache_stats, name="cache_stats"),
+    path('coins/', views.get_coin_balance, name="coin_balance"),
+    path('profile/', views.ProfileView.as_view(), name="profile"),
+    path('leaderboard/', views.get_leaderboard, name="leaderboard"),
+]
+
+if settings.ASYNC_API:
+    # Under ASGI, serve the read-heavy calendar endpoints from the async views
+    async_routes = {
+        'daylog': async_views.day_log_list,
+        'user_submissions': async_views.get_user_submissions,
+        'user_stats': async_views.get_user_stats,
+        'coin_balance': async_views.get_coin_balance,
+        'export_history': async_views.export_history,
+    }
+    urlpatterns = [
+        path(str(pattern.pattern), async_routes[pattern.name], name=pattern.name)
+        if pattern.name in async_routes else pattern
+        for pattern in urlpatterns
+    ]
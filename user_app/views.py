@@ -4,23 +4,40 @@ from .models import *
 from rewards_app.models import *
 # Render import
 from django.http import HttpResponseRedirect
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.shortcuts import render
 from django.urls import reverse
 # DRF import
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, throttle_classes
 from rest_framework import generics
+from rest_framework.exceptions import NotFound, ValidationError
 from .serializers import *
+from .streaks import PASSED, log_day, log_days
+from .pagination import DayCursorPagination, LeaderboardPagination
+from .dashboard import get_dashboard, set_dashboard, dashboard_cache_stats
+from . import leaderboard, ledger, rollups
+from .export import EXPORT_FORMATS, attachment_headers, export_rows
+from .idempotency import idempotent
+from .throttling import (
+    LoginIPThrottle, LoginUsernameThrottle, PasswordResetAccountThrottle,
+    PasswordResetEmailThrottle, PasswordResetIPThrottle, throttle_stats
+)
 # Auth import
 from django.contrib.auth import authenticate, login, logout
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.middleware.csrf import get_token
 # Email and password reset imports
-from django.core.mail import send_mail
+from tasks_app.registry import enqueue
+from tasks_app.tasks import enqueue_mail
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
+from django.utils.dateparse import parse_date
 # Extra
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from django.conf import settings
 
 def landing(request):
     return render(request, 'index.html')
@@ -34,34 +51,40 @@ def CreateUser(request):
     if request.method == 'POST':
         try:
             # Debug: print(request.data) 
-
-            # Check if user already exists
-            if User.objects.filter(username=request.data['username']).exists():
-                return JsonResponse({'error': 'Username already exists'}, status=400)
-            
-            # Check if email already exists
+            username = request.data['username']
             email = request.data.get('email', '').strip()
-            if email and User.objects.filter(email=email).exists():
+
+            # One query for both uniqueness checks
+            clashes = User.objects.filter(Q(username=username) | Q(email=email) if email else Q(username=username))
+            for existing_username in clashes.values_list('username', flat=True):
+                if existing_username == username:
+                    return JsonResponse({'error': 'Username already exists'}, status=400)
                 return JsonResponse({'error': 'Email address already exists'}, status=400)
 
-            user = User.objects.create_user(
-                username=request.data['username'],
-                first_name=request.data['first_name'],
-                last_name=request.data['last_name'],
-                password=request.data['password'],
-                email=request.data.get('email', '')
-            )
-            profile = Profile.objects.create(
-                user=user,
-                coins=100,  # Starting coins
-                streak=0
-            )
-            badge = StreakBadge.objects.create(
-                user=user,
-            )
-
-            log_user = authenticate(username=request.data['username'], password=request.data['password'])
-            login(request, log_user)
+            # User, Profile and StreakBadge appear together or not at all
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    first_name=request.data['first_name'],
+                    last_name=request.data['last_name'],
+                    password=request.data['password'],
+                    email=email
+                )
+                profile = Profile.objects.create(
+                    user=user,
+                    coins=ledger.STARTING_COINS,
+                    streak=0
+                )
+                ledger.post(user.id, ledger.STARTING_COINS, CoinTransaction.GRANT, 'starting coins')
+                badge = StreakBadge.objects.create(
+                    user=user,
+                )
+            set_dashboard(user.id, profile.coins, profile.streak, badge.multiplyer)
+            leaderboard.update_entry(user.id, user.username, profile.streak, profile.coins)
+
+            # create_user just hashed the password; authenticate() would hash
+            # it a second time only to get back the same user
+            login(request, user)
             
             return JsonResponse({
                 'success': True,
@@ -69,12 +92,18 @@ def CreateUser(request):
                 'username': user.username,
                 'first_name': user.first_name,
                 'last_name': user.last_name,
-                'email': user.email
+                'email': user.email,
+                'csrfToken': get_token(request)  # login() rotated it
             })
+        except IntegrityError:
+            # Lost a race with a concurrent signup for the same username
+            return JsonResponse({'error': 'Username already exists'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
 @api_view(['POST'])
+@authentication_classes([])  # throttles run before any session or user lookup
+@throttle_classes([LoginIPThrottle, LoginUsernameThrottle])
 def login_user(request):
     if request.method == 'POST':
         try:
@@ -84,10 +113,8 @@ def login_user(request):
             if not username or not password:
                 return JsonResponse({'error': 'Username and password are required'}, status=400)
             
-            # Check if user exists
-            if not User.objects.filter(username=username).exists():
-                return JsonResponse({'error': 'Invalid username or password'}, status=401)
-            
+            # authenticate() does the one user lookup (and still spends a hash
+            # on unknown usernames, so timing doesn't reveal which exist)
             user = authenticate(request, username=username, password=password)
             if user is not None:
                 if user.is_active:
@@ -99,7 +126,8 @@ def login_user(request):
                         'username': user.username,
                         'first_name': user.first_name,
                         'last_name': user.last_name,
-                        'email': user.email
+                        'email': user.email,
+                        'csrfToken': get_token(request)  # login() rotated it
                     })
                 else:
                     return JsonResponse({'error': 'Account is disabled'}, status=401)
@@ -123,6 +151,8 @@ def logout_user(request):
 
 # Password Reset API Endpoints
 @api_view(['POST'])
+@authentication_classes([])
+@throttle_classes([PasswordResetIPThrottle, PasswordResetEmailThrottle])
 def forgot_password(request):
     """Send password reset email"""
     try:
@@ -148,6 +178,15 @@ def forgot_password(request):
         # In production, you'd send an actual email
         # For now, return the token for demo purposes
         reset_link = f"https://habify-app.onrender.com/reset-password?token={token}&uid={uid}"
+
+        # Sent by the background worker so SMTP latency never holds up a request
+        enqueue_mail(
+            'Reset your Habify password',
+            f"Hi {user.first_name or user.username},\n\n"
+            f"Use this link to choose a new password:\n{reset_link}\n\n"
+            "If you didn't ask for this, you can ignore this email.",
+            [user.email]
+        )
         
         return JsonResponse({
             'success': True,
@@ -162,6 +201,8 @@ def forgot_password(request):
         return JsonResponse({'error': 'Failed to process request. Please try again.'}, status=500)
 
 @api_view(['POST'])
+@authentication_classes([])
+@throttle_classes([PasswordResetIPThrottle, PasswordResetAccountThrottle])
 def reset_password(request):
     """Reset password with token"""
     try:
@@ -204,60 +245,206 @@ def get_csrf(request):
     return JsonResponse({'csrfToken': get_token(request)})
 
 
+@require_GET
+def bootstrap(request):
+    """
+    Everything the app needs on load in one response: the CSRF token, the
+    session user, dashboard stats, this month's submissions and owned
+    rewards. At most six queries (session, user, two on a dashboard cache
+    miss, days, rewards) whatever the history size.
+
+    CSRF contract: the token stays valid for the whole session, so clients
+    keep it and send it with every POST. Only login and signup rotate it
+    (their responses carry the new one); a 403 mentioning CSRF means it is
+    stale and should be fetched again once.
+    """
+    response = {'csrfToken': get_token(request), 'user': None}
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse(response)
+
+    month_start = date.today().replace(day=1)
+    days = Day.objects.filter(user=user, day__gte=month_start).order_by('day').values('day', 'activity', 'notes')
+    rewards = Rewards.objects.filter(user=user).order_by('id').values('id', 'title', 'img', 'price')
+    response.update({
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+        },
+        'profile': get_dashboard(user.id),
+        'month': month_start.strftime('%Y-%m'),
+        'submissions': [{'day': str(d['day']), 'activity': d['activity'], 'notes': d['notes']} for d in days],
+        'rewards': list(rewards),
+    })
+    return JsonResponse(response)
+
+
 # Calendar
+def filter_day_range(queryset, params):
+    """
+    Narrow a Day queryset to the optional ?from=YYYY-MM-DD and ?to=YYYY-MM-DD
+    bounds (both inclusive) so it reads a bounded (user, day) index range.
+    Raises ValueError on a malformed date.
+    """
+    for param, lookup in (('from', 'day__gte'), ('to', 'day__lte')):
+        value = params.get(param)
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ValueError(f"'{param}' must be a date in YYYY-MM-DD format")
+            queryset = queryset.filter(**{lookup: parsed})
+    return queryset
+
+
 class DayLogView(generics.ListAPIView):
     serializer_class = DayLogSerializer
+    pagination_class = DayCursorPagination
     
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Day.objects.filter(user=self.request.user).order_by('-day')
+            queryset = Day.objects.filter(user=self.request.user).select_related('user')
+            try:
+                queryset = filter_day_range(queryset, self.request.query_params)
+            except ValueError as e:
+                raise ValidationError({'error': str(e)})
+            return queryset
         return Day.objects.none()
 
+
 @api_view(['GET'])
 def get_user_submissions(request):
-    """Get user's day submissions for calendar display"""
+    """
+    Get user's day submissions for calendar display, one cursor page at a time.
+
+    Query params: ?cursor= (from the previous page's 'next'), ?page_size=,
+    ?from=/?to= date bounds and ?compact=1 for [day, activity, notes] rows.
+    Profile stats are only included on the first page; later pages (and
+    clients that already have them) can use /api/stats/.
+    """
     try:
         if not request.user.is_authenticated:
             return JsonResponse({'error': 'Authentication required'}, status=401)
             
-        # Get user's day logs
-        day_logs = Day.objects.filter(user=request.user).order_by('-day')
-        submissions = []
-        
-        for log in day_logs:
-            submissions.append({
-                'day': str(log.day),
-                'activity': log.activity,
-                'notes': log.notes,
-                'user': request.user.username,
-                'timestamp': log.day.strftime('%Y-%m-%dT%H:%M:%S.%fZ') if hasattr(log.day, 'strftime') else str(log.day) + 'T00:00:00.000Z'
-            })
-            
-        # Get user profile for additional stats
+        # Get user's day logs, optionally limited to a ?from=/?to= window
         try:
-            profile = Profile.objects.get(user=request.user)
-            badge = StreakBadge.objects.get(user=request.user)
-        except (Profile.DoesNotExist, StreakBadge.DoesNotExist):
-            profile = None
-            badge = None
-            
-        return JsonResponse({
+            day_logs = filter_day_range(Day.objects.filter(user=request.user), request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        paginator = DayCursorPagination()
+        page = paginator.paginate_queryset(day_logs.values('day', 'activity', 'notes'), request)
+        compact = request.GET.get('compact') in ('1', 'true')
+
+        if compact:
+            submissions = [[str(log['day']), log['activity'], log['notes']] for log in page]
+        else:
+            submissions = [{
+                'day': str(log['day']),
+                'activity': log['activity'],
+                'notes': log['notes'],
+                'user': request.user.username,
+                'timestamp': log['day'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            } for log in page]
+
+        response = {
             'success': True,
             'submissions': submissions,
-            'profile': {
-                'coins': profile.coins if profile else 0,
-                'streak': profile.streak if profile else 0,
-                'multiplier': badge.multiplyer if badge else 1
-            } if profile else None
-        })
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        }
+        if compact:
+            response['fields'] = ['day', 'activity', 'notes']
+        if not request.GET.get(paginator.cursor_query_param):
+            response['profile'] = get_dashboard(request.user.id)
+        return JsonResponse(response)
         
+    except NotFound:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
     except Exception as e:
         print(f"Error in get_user_submissions: {str(e)}")
         return JsonResponse({'error': 'Failed to fetch user submissions'}, status=500)
 
 
+@require_GET
+def export_history(request):
+    """
+    Stream the user's whole Day history as a download, oldest first.
+    ?format=ndjson (default) or ?format=csv, plus the usual ?from=/?to=.
+    A plain Django view, since DRF reserves ?format= for its own renderers.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+    try:
+        day_logs = filter_day_range(Day.objects.filter(user=request.user), request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        export_rows(day_logs.order_by('day'), export_format),
+        content_type=EXPORT_FORMATS[export_format][0]
+    )
+    return attachment_headers(response, request.user.username, export_format)
+
+
+@api_view(['GET'])
+def get_user_stats(request):
+    """Profile and badge stats for the dashboard, without any submissions"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    return JsonResponse({'success': True, 'profile': get_dashboard(request.user.id)})
+
+
+@api_view(['GET'])
+def get_coin_balance(request):
+    """The live coin balance from the ledger, cached until the user's next transaction"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    return JsonResponse({'success': True, 'coins': ledger.get_balance(request.user.id)})
+
+
+@api_view(['GET'])
+def get_monthly_stats(request):
+    """
+    Success rate, activity distribution, longest streak and coins earned per
+    month and in total, read from MonthlyRollup only. Optional ?from= and
+    ?to= take YYYY-MM.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    rows = MonthlyRollup.objects.filter(user=request.user).order_by('month')
+    for param, lookup in (('from', 'month__gte'), ('to', 'month__lte')):
+        value = request.query_params.get(param)
+        if value:
+            try:
+                month = parse_date(f'{value}-01') if len(value) == 7 else None
+            except ValueError:
+                month = None
+            if month is None:
+                return JsonResponse({'error': f"'{param}' must be YYYY-MM"}, status=400)
+            rows = rows.filter(**{lookup: month})
+    months, total = rollups.summarize(
+        rows.values('month', 'days_logged', 'activity_counts', 'longest_streak', 'coins_earned'), PASSED
+    )
+    return JsonResponse({'success': True, 'months': months, 'total': total})
+
+
+@api_view(['GET'])
+def get_cache_stats(request):
+    """Dashboard cache and throttle counters for this worker (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    return JsonResponse({'success': True, 'dashboard': dashboard_cache_stats(), 'throttle': throttle_stats()})
+
+
 
 @api_view(['POST'])
+@idempotent('daylog')
 def NewDayLog(request):
     if request.method == 'POST':
         try:
@@ -267,104 +454,21 @@ def NewDayLog(request):
                 
             activity = request.data.get('activity')
             notes = request.data.get('notes', '')
-            today = str(datetime.now())[0:10]
             
             if activity is None:
                 return JsonResponse({'error': 'Activity value is required'}, status=400)
 
-            # Get or create user profile and badge
-            user_profile, created = Profile.objects.get_or_create(
-                user=request.user,
-                defaults={'coins': 100, 'streak': 0}
-            )
-            user_badge, created = StreakBadge.objects.get_or_create(
-                user=request.user,
-                defaults={'weeks': 0, 'color': '#ffffff', 'multiplyer': 1}
-            )
-            
-            # Check if user already submitted today
-            existing_log = Day.objects.filter(user=request.user, day=today).first()
-            if existing_log:
-                # Update existing log
-                existing_log.activity = activity
-                existing_log.notes = notes
-                existing_log.save()
-                new_day = existing_log
-            else:
-                # Create new log
-                new_day = Day.objects.create(
-                    user=request.user,
-                    day=today,
-                    activity=activity,
-                    notes=notes
-                )
-
-            user_days = Day.objects.filter(user=request.user)
-            yesterdays_date = str(datetime.now() + timedelta(days=-1))[0:10]
-            
-            coins_earned = 0
-            
-            # Handle failure or missed day
-            if activity == 1 or (yesterdays_date != str(user_profile.last_updated) and len(user_days) > 1):
-                user_profile.streak = 0
-                user_badge.weeks = 0
-                user_badge.color = "#ffffff"
-                user_badge.multiplyer = 1
-                
-                if activity == 1:  # Only deduct coins for actual failure
-                    coins_lost = min(user_profile.coins, 10)
-                    user_profile.coins -= coins_lost
-                    
-                user_profile.last_updated = datetime.now()
-                user_profile.save()
-                user_badge.save()
-                
-            # Handle success
-            elif activity == 5:
-                user_profile.streak += 1
-                coins_earned = 50 * user_badge.multiplyer
-                user_profile.coins += coins_earned
-                user_profile.last_updated = datetime.now()
-                user_profile.save()
-
-                # Update streak badge
-                if user_profile.streak % 7 == 0: 
-                    user_badge.color = 'grey'
-                    user_badge.multiplyer = 1.125
-                    user_badge.weeks += 1
-                    
-                    # Badge progression
-                    weeks = user_badge.weeks
-                    if weeks >= 4:
-                        user_badge.color = 'yellow'
-                        user_badge.multiplyer = 1.25
-                    if weeks >= 13:
-                        user_badge.color = 'green'
-                        user_badge.multiplyer = 1.5
-                    if weeks >= 26:
-                        user_badge.color = 'blue'
-                        user_badge.multiplyer = 1.75
-                    if weeks >= 39:
-                        user_badge.color = 'purple'
-                        user_badge.multiplyer = 2
-                    if weeks >= 52:
-                        user_badge.color = 'orange'
-                        user_badge.multiplyer = 2.5
-                        
-                    user_badge.save()
+            # Upsert today's log and apply streak/coin/badge rules in one locked transaction
+            data = log_day(request.user, activity, notes)
+            if data['badge_upgraded']:
+                enqueue('badge_upgrade', {'user_id': request.user.id})
+            set_dashboard(request.user.id, data['current_coins'], data['current_streak'], data['multiplier'])
+            leaderboard.update_entry(request.user.id, request.user.username, data['current_streak'], data['current_coins'])
 
             return JsonResponse({
                 'success': True,
                 'message': 'Day log saved successfully',
-                'data': {
-                    'day': today,
-                    'activity': activity,
-                    'notes': notes,
-                    'coins_earned': coins_earned,
-                    'current_coins': user_profile.coins,
-                    'current_streak': user_profile.streak,
-                    'multiplier': user_badge.multiplyer
-                }
+                'data': data
             })
             
         except Exception as e:
@@ -372,6 +476,105 @@ def NewDayLog(request):
             print(f"Error in NewDayLog: {str(e)}")
             return JsonResponse({'error': 'Failed to save day log. Please try again.'}, status=500)
 
+@api_view(['POST'])
+def NewDayLogBatch(request):
+    """
+    Record several check-ins at once, e.g. replayed by an offline client.
+    Body: {"entries": [{"day": "YYYY-MM-DD", "activity": 5, "notes": ""}, ...]}
+    The outcome is the same as posting each entry to NewDayLog in day order;
+    entries on or before the last applied check-in come back with "skipped".
+    """
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+
+        raw_entries = request.data.get('entries')
+        if not isinstance(raw_entries, list) or not raw_entries:
+            return JsonResponse({'error': 'entries must be a non-empty list'}, status=400)
+        if len(raw_entries) > settings.DAYLOG_BATCH_MAX:
+            return JsonResponse({'error': f'At most {settings.DAYLOG_BATCH_MAX} entries per batch'}, status=400)
+
+        today = date.today()
+        entries = []
+        for index, entry in enumerate(raw_entries):
+            if not isinstance(entry, dict):
+                return JsonResponse({'error': f'Entry {index} must be an object'}, status=400)
+            try:
+                day = parse_date(str(entry.get('day', '')))
+            except ValueError:
+                day = None
+            if day is None or day > today:
+                return JsonResponse({'error': f'Entry {index} needs a valid, non-future day (YYYY-MM-DD)'}, status=400)
+            if entry.get('activity') is None:
+                return JsonResponse({'error': f'Entry {index}: activity value is required'}, status=400)
+            entries.append((day, entry['activity'], entry.get('notes', '')))
+
+        results = log_days(request.user, entries)
+        final = results[-1]
+        if any(result['badge_upgraded'] for result in results):
+            enqueue('badge_upgrade', {'user_id': request.user.id})
+        set_dashboard(request.user.id, final['current_coins'], final['current_streak'], final['multiplier'])
+        leaderboard.update_entry(request.user.id, request.user.username, final['current_streak'], final['current_coins'])
+
+        return JsonResponse({
+            'success': True,
+            'message': f"{sum(not result['skipped'] for result in results)} day logs saved successfully",
+            'results': results,
+            'data': final
+        })
+
+    except Exception as e:
+        print(f"Error in NewDayLogBatch: {str(e)}")
+        return JsonResponse({'error': 'Failed to save day logs. Please try again.'}, status=500)
+
 class ProfileView(generics.ListAPIView):
-    queryset = Profile.objects.all()
-    serializer_class = ProfileSerializer
\ No newline at end of file
+    """
+    The requesting user's profile. ?leaderboard=1 instead pages through the
+    precomputed leaderboard (LeaderboardEntry) by streak then coins.
+    """
+    pagination_class = LeaderboardPagination
+
+    @property
+    def leaderboard_mode(self):
+        return self.request.query_params.get('leaderboard') in ('1', 'true')
+
+    @property
+    def paginator(self):
+        # Only the leaderboard is paginated; the own-profile list has one row
+        if not self.leaderboard_mode:
+            return None
+        return super().paginator
+
+    def get_serializer_class(self):
+        return LeaderboardEntrySerializer if self.leaderboard_mode else ProfileSerializer
+
+    def get_queryset(self):
+        if self.leaderboard_mode:
+            return LeaderboardEntry.objects.order_by(*leaderboard.ordering('streak'))
+        if self.request.user.is_authenticated:
+            return Profile.objects.select_related('user').annotate(
+                balance=ledger.live_balance()
+            ).filter(user=self.request.user)
+        return Profile.objects.none()
+
+
+@api_view(['GET'])
+def get_leaderboard(request):
+    """
+    Top-N of the precomputed leaderboard plus the requester's own rank.
+    Query params: ?board=streak|coins (default streak), ?limit= (default 10).
+    """
+    board = request.GET.get('board', 'streak')
+    if board not in leaderboard.BOARDS:
+        return JsonResponse({'error': f"board must be one of: {', '.join(leaderboard.BOARDS)}"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'board': board,
+        'top': leaderboard.top(board, limit),
+        'me': leaderboard.rank_of(request.user.id, board) if request.user.is_authenticated else None
+    })